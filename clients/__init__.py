@@ -3,10 +3,13 @@
 包含各种第三方服务的客户端实现
 """
 
-from . import ocr
-from . import storage
-from . import llm
-from . import redis
-from . import celery
+import importlib
 
-__all__ = ['ocr', 'storage', 'llm', 'redis', 'celery'] 
\ No newline at end of file
+__all__ = ['ocr', 'storage', 'llm', 'redis', 'celery']
+
+
+def __getattr__(name: str):
+    """按需导入子模块，避免导入 clients.ocr 时连带加载 Redis、Celery 等较重的依赖"""
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,8 +8,9 @@ import os
 from typing import Dict, Any, Optional
 
 from celery import Celery
-from celery.signals import task_failure, task_success, task_revoked, worker_ready
+from celery.signals import task_failure, task_success, task_revoked, worker_ready, worker_process_init
 from config import APIConfig, load_api_config
+from config.api_config import dispose_engine_after_fork
 
 logger = logging.getLogger(__name__)
 
@@ -162,6 +163,12 @@ def worker_ready_handler(**kwargs):
     logger.info("Celery worker就绪")
 
 
+@worker_process_init.connect
+def worker_process_init_handler(**kwargs):
+    """子进程启动时丢弃继承自父进程的数据库连接，避免跨进程共享套接字"""
+    dispose_engine_after_fork()
+
+
 # 使用默认配置初始化Celery
 configure_celery(celery_app)
 
@@ -15,7 +15,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 # 导入数据库相关组件
-from config.api_config import SessionLocal
+from config.api_config import _get_scoped_session
 from clients.db.crud import (
     create_task_log, 
     update_task_log_on_start, 
@@ -47,7 +47,6 @@ class DatabaseAwareTask(Task):
     def __init__(self):
         """初始化任务"""
         super().__init__()
-        self._db = None
         self.progress = 0  # 进度（0-100）
         self.status_message = "已初始化"
     
@@ -55,18 +54,22 @@ class DatabaseAwareTask(Task):
         """
         获取数据库会话
         
+        任务实例在同一进程的多个线程间共享，会话按线程隔离，同一线程内重复调用返回同一会话
+        
         返回:
         - Session: SQLAlchemy会话实例
         """
-        if self._db is None:
-            self._db = SessionLocal()
-        return self._db
+        # 首次使用时才创建数据库引擎和会话注册表
+        scoped = _get_scoped_session()
+        if scoped is None:
+            raise RuntimeError("数据库配置不完整，无法建立连接")
+        return scoped()
     
     def close_db_session(self):
-        """关闭数据库会话"""
-        if self._db is not None:
-            self._db.close()
-            self._db = None
+        """关闭当前线程的数据库会话"""
+        scoped = _get_scoped_session()
+        if scoped is not None:
+            scoped.remove()
     
     def update_progress(self, progress: int, message: str = "") -> None:
         """
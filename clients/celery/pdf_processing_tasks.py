@@ -20,7 +20,7 @@ from .app import celery_app
 # 导入MarkMuse相关模块
 from markmuse import MarkMuse
 from clients.storage import S3Storage
-from clients.factory import create_clients
+from clients.factory import create_ocr_client, create_llm_client
 from config import load_api_config, APIConfig
 from clients.prompts import PromptManager
 
@@ -103,10 +103,10 @@ def transcribe_pdf_url_to_md_task(self,
         llm_provider_opt = task_options.get('llm_provider', 'openai')
         parallel_images_opt = task_options.get('parallel_images', app_config.parallel_images)
         
-        # 4. 为MarkMuse创建OCR和LLM客户端
-        clients = create_clients(app_config, llm_provider_opt)
-        ocr_client = clients.get("ocr_client")
-        llm_client = clients.get("llm_client")
+        # 4. 为MarkMuse创建OCR和LLM客户端；MarkMuse 只需要这两个客户端，
+        #    不通过 create_clients 重复创建存储、Redis 客户端和重新配置 Celery，未启用图片增强时不创建 LLM 客户端
+        ocr_client = create_ocr_client(app_config)
+        llm_client = create_llm_client(app_config, llm_provider_opt) if enhance_opt else None
         
         if not ocr_client:
             raise ValueError("无法为MarkMuse创建OCR客户端")
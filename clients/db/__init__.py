@@ -3,6 +3,16 @@
 提供 PostgreSQL 数据库连接和 ORM 模型
 """
 
-from config.api_config import Base, engine, SessionLocal, get_db
+from config.api_config import Base, get_db, _get_engine, _get_sessionmaker
+
+
+def __getattr__(name: str):
+    """按需从配置模块获取 engine 和 SessionLocal，导入本模块时不创建数据库引擎"""
+    if name == "engine":
+        return _get_engine()
+    if name == "SessionLocal":
+        return _get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["Base", "engine", "SessionLocal", "get_db"] 
\ No newline at end of file
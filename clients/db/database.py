@@ -3,17 +3,28 @@
 """
 
 import logging
-from config.api_config import Base, engine, SessionLocal, get_db
+from config.api_config import Base, get_db, _get_engine, _get_sessionmaker
 
 logger = logging.getLogger(__name__)
 
 __all__ = ["init_db", "Base", "engine", "SessionLocal", "get_db"]
 
+
+def __getattr__(name: str):
+    """按需从配置模块获取 engine 和 SessionLocal，导入本模块时不创建数据库引擎"""
+    if name == "engine":
+        return _get_engine()
+    if name == "SessionLocal":
+        return _get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def init_db():
     """
     初始化数据库
     创建所有在模型中定义的表
     """
+    engine = _get_engine()
     if engine is None:
         logger.error("数据库引擎未初始化，无法创建表")
         return False
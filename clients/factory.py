@@ -4,14 +4,17 @@
 """
 
 import logging
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any
 
 from config import APIConfig
 from clients.ocr import OCRClient, MistralOCRClient
-from clients.storage import S3Storage
 from clients.llm import LLMClient, OpenAILLMClient, QianfanLLMClient, LLMClientError
-from clients.redis import RedisClient, RedisError
-from clients.celery.app import celery_app, configure_celery
+
+# 存储、Redis 和 Celery 依赖 boto3、redis、celery 等较重的库，在对应的工厂函数中再导入，
+# 使只创建 OCR 和 LLM 客户端的命令行转换不加载这些依赖
+if TYPE_CHECKING:
+    from clients.storage import S3Storage
+    from clients.redis import RedisClient
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +40,7 @@ def create_ocr_client(config: APIConfig) -> Optional[OCRClient]:
         return None
 
 
-def create_storage_client(config: APIConfig, storage_type: str = "s3") -> Optional[S3Storage]:
+def create_storage_client(config: APIConfig, storage_type: str = "s3") -> Optional["S3Storage"]:
     """
     创建存储客户端
     
@@ -55,6 +58,7 @@ def create_storage_client(config: APIConfig, storage_type: str = "s3") -> Option
                 logger.warning("未设置完整的 S3 配置，无法创建存储客户端")
                 return None
             
+            from clients.storage import S3Storage
             return S3Storage(config)
         else:
             logger.error(f"不支持的存储类型: {storage_type}")
@@ -103,7 +107,7 @@ def create_llm_client(config: APIConfig, provider: str = "openai") -> Optional[L
         return None
 
 
-def create_redis_client(config: APIConfig) -> Optional[RedisClient]:
+def create_redis_client(config: APIConfig) -> Optional["RedisClient"]:
     """
     创建 Redis 客户端
     
@@ -113,6 +117,8 @@ def create_redis_client(config: APIConfig) -> Optional[RedisClient]:
     返回:
     - RedisClient: Redis 客户端实例，如果创建失败则返回 None
     """
+    from clients.redis import RedisClient, RedisError
+    
     try:
         return RedisClient(config=config)
     except RedisError as e:
@@ -134,6 +140,8 @@ def create_celery_app(config: APIConfig, **kwargs) -> Any:
     返回:
     - Any: Celery 应用实例
     """
+    from clients.celery.app import celery_app, configure_celery
+    
     try:
         return configure_celery(celery_app, config, **kwargs)
     except Exception as e:
@@ -155,6 +163,9 @@ def create_clients(config: APIConfig, llm_provider: str = "openai") -> Dict[str,
     返回:
     - Dict[str, Any]: 包含所有创建的客户端的字典
     """
+    from clients.redis import get_default_client
+    from clients.celery.app import celery_app, configure_celery
+    
     clients = {
         "ocr_client": create_ocr_client(config),
         "llm_client": create_llm_client(config, llm_provider),
@@ -167,9 +178,9 @@ def create_clients(config: APIConfig, llm_provider: str = "openai") -> Dict[str,
     if hasattr(config, 's3_access_key') and config.s3_access_key:
         clients["storage_client"] = create_storage_client(config)
     
-    # 尝试创建Redis客户端
+    # 尝试获取共享的Redis客户端，避免每次调用都新建连接池
     try:
-        clients["redis_client"] = create_redis_client(config)
+        clients["redis_client"] = get_default_client(config)
     except Exception as e:
         logger.warning(f"创建Redis客户端失败: {str(e)}")
     
@@ -5,5 +5,6 @@ LLM 客户端模块，提供各种大语言模型服务的统一接口
 from .abstract_llm import LLMClient, LLMClientError
 from .openai_llm import OpenAILLMClient
 from .qianfan_llm import QianfanLLMClient
+from .cache import ImageAnalysisCache
 
-__all__ = ['LLMClient', 'LLMClientError', 'OpenAILLMClient', 'QianfanLLMClient'] 
\ No newline at end of file
+__all__ = ['LLMClient', 'LLMClientError', 'OpenAILLMClient', 'QianfanLLMClient', 'ImageAnalysisCache'] 
\ No newline at end of file
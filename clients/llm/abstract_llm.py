@@ -1,10 +1,55 @@
+import time
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Set, Optional, AsyncIterator, Union
 
+from tqdm import tqdm
+
+# 打字效果输出的最长缓冲时间（秒）
+_TYPING_FLUSH_INTERVAL = 0.2
+
 class LLMClientError(Exception):
     """LLM 客户端通用异常类"""
     pass
 
+class TypingOutputBuffer:
+    """
+    打字效果输出缓冲区
+    
+    流式响应的每个分片通常只有几个字符，逐片输出会产生大量写调用并争用输出锁；
+    缓冲区在遇到换行或距上次输出超过 _TYPING_FLUSH_INTERVAL 秒时才合并输出
+    """
+    
+    def __init__(self, writer):
+        """
+        初始化缓冲区
+        
+        参数:
+            writer: 实际输出文本的函数
+        """
+        self._writer = writer
+        self._parts: List[str] = []
+        self._last_flush = time.monotonic()
+    
+    def write(self, text: str) -> None:
+        """
+        写入一个分片
+        
+        参数:
+            text: 分片文本
+        """
+        self._parts.append(text)
+        if "\n" in text or time.monotonic() - self._last_flush >= _TYPING_FLUSH_INTERVAL:
+            self.flush()
+    
+    def flush(self) -> None:
+        """输出缓冲区中的全部文本"""
+        if self._parts:
+            self._writer("".join(self._parts))
+            self._parts.clear()
+        self._last_flush = time.monotonic()
+
+
 class LLMClient(ABC):
     """
     LLM 客户端抽象基类，定义所有 LLM 能力的通用接口。
@@ -46,6 +91,29 @@ class LLMClient(ABC):
         import os
         return os.environ.get('LOG_LEVEL', 'INFO').upper() == 'DEBUG'
     
+    @staticmethod
+    def write_typing_output(text: str, end: str = "") -> None:
+        """
+        输出打字效果文本
+        
+        通过 tqdm.write 输出，多个图片并发分析时不会打断进度条
+        
+        参数:
+            text: 输出的文本
+            end: 结尾字符
+        """
+        tqdm.write(text, end=end)
+    
+    @classmethod
+    def create_typing_buffer(cls) -> "TypingOutputBuffer":
+        """
+        创建打字效果输出缓冲区
+        
+        返回:
+            TypingOutputBuffer: 按换行或时间间隔批量调用 write_typing_output 的缓冲区
+        """
+        return TypingOutputBuffer(cls.write_typing_output)
+    
     @abstractmethod
     def chat(self, messages: List[Dict[str, Any]], **kwargs) -> str:
         """
@@ -117,4 +185,36 @@ class LLMClient(ABC):
         返回:
             图片分析描述
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    async def aanalyze_image_streaming(self, image_base64: str, img_id: str, **kwargs) -> str:
+        """
+        异步流式分析图片（Base64格式）
+        
+        默认在线程池中执行同步实现，支持原生异步接口的子类应重写此方法
+        
+        参数:
+            image_base64: Base64 编码的图片数据
+            img_id: 图片ID
+            **kwargs: 额外参数
+            
+        返回:
+            图片分析描述
+        """
+        return await asyncio.to_thread(self.analyze_image_streaming, image_base64, img_id, **kwargs)
+    
+    async def aanalyze_image_url(self, image_url: str, analysis_prompt: Optional[str] = None, **kwargs) -> str:
+        """
+        异步分析图片（URL格式）
+        
+        默认在线程池中执行同步实现，支持原生异步接口的子类应重写此方法
+        
+        参数:
+            image_url: 图片URL
+            analysis_prompt: 分析提示词
+            **kwargs: 额外参数
+            
+        返回:
+            图片分析描述
+        """
+        return await asyncio.to_thread(self.analyze_image_url, image_url, analysis_prompt, **kwargs) 
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""
+图片分析结果缓存
+精确层按图片内容 SHA-256 和提示词缓存分析结果；语义层按图片感知哈希 (dHash)
+查找同一模型和提示词下汉明距离足够近的已分析图片，复用其描述，避免对重复或近似图片重复调用多模态模型
+"""
+
+import os
+import io
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# Pillow 为可选依赖，未安装时只使用精确匹配层
+try:
+    from PIL import Image
+    PIL_SUPPORT = True
+except ImportError:
+    PIL_SUPPORT = False
+
+logger = logging.getLogger(__name__)
+
+# dHash 缩放尺寸: 9x8 灰度图，比较相邻像素得到 64 位哈希
+_DHASH_WIDTH = 9
+_DHASH_HEIGHT = 8
+# 语义层内存索引保留的最大条目数
+_INDEX_LIMIT = 10000
+_CACHE_SUFFIX = ".json"
+
+
+def dhash(image_data: bytes) -> Optional[int]:
+    """
+    计算图片的 64 位差异哈希 (dHash)
+    
+    参数:
+    - image_data: 图片字节数据
+    
+    返回:
+    - Optional[int]: 哈希值，未安装 Pillow 或图片无法解析时返回 None
+    """
+    if not PIL_SUPPORT:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            pixels = list(
+                image.convert("L").resize((_DHASH_WIDTH, _DHASH_HEIGHT), Image.LANCZOS).getdata()
+            )
+    except Exception as e:
+        logger.debug(f"计算图片感知哈希失败: {str(e)}")
+        return None
+    
+    value = 0
+    for row in range(_DHASH_HEIGHT):
+        offset = row * _DHASH_WIDTH
+        for col in range(_DHASH_WIDTH - 1):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class ImageAnalysisCache:
+    """
+    图片分析结果的两级磁盘缓存
+    
+    每条结果保存为一个 JSON 文件 {sha, phash, model, context, description}，context 为模型和提示词的哈希；
+    语义层在内存中维护最近条目的 (phash, context, description) 索引，线性扫描计算汉明距离
+    """
+    
+    def __init__(self, cache_dir: Union[str, Path], max_distance: int = 8):
+        """
+        初始化图片分析缓存
+        
+        参数:
+        - cache_dir: 缓存目录
+        - max_distance: 语义层允许复用的最大汉明距离，小于 0 表示关闭语义层
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_distance = max_distance
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._index: List[Tuple[int, str, str]] = []
+        if PIL_SUPPORT and max_distance >= 0:
+            self._load_index()
+        logger.info(f"已启用图片分析缓存，目录: {self.cache_dir}")
+    
+    def _load_index(self) -> None:
+        """从缓存目录加载最近条目的感知哈希索引"""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(_CACHE_SUFFIX):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort(reverse=True)
+        
+        for _, path in entries[:_INDEX_LIMIT]:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # 缺少 context 的旧条目无法确认提示词，不加入语义索引
+            if record.get("phash") is not None and record.get("context") and record.get("description"):
+                self._index.append((record["phash"], record["context"], record["description"]))
+        # 索引按从旧到新排列，超出上限时淘汰最旧的条目
+        self._index.reverse()
+        logger.debug(f"已加载 {len(self._index)} 条图片感知哈希索引")
+    
+    @staticmethod
+    def make_context(model: str, prompt: str) -> str:
+        """
+        计算模型和提示词的哈希，语义层只复用同一上下文下的分析结果
+        
+        参数:
+        - model: 模型名称
+        - prompt: 分析提示词
+        
+        返回:
+        - str: 上下文哈希
+        """
+        return hashlib.blake2b(f"{model}\0{prompt}".encode("utf-8"), digest_size=8).hexdigest()
+    
+    @classmethod
+    def make_key(cls, image_sha: str, model: str, prompt: str) -> str:
+        """
+        构建精确层缓存键
+        
+        参数:
+        - image_sha: 图片内容的 SHA-256
+        - model: 模型名称
+        - prompt: 分析提示词
+        
+        返回:
+        - str: 缓存键
+        """
+        return f"{image_sha}-{cls.make_context(model, prompt)}"
+    
+    def _count(self, name: str) -> None:
+        """线程安全地更新命中统计"""
+        with self._lock:
+            self.stats[name] += 1
+    
+    def lookup(self, image_data: bytes, model: str, prompt: str) -> Tuple[Optional[str], Dict]:
+        """
+        查找图片的分析结果
+        
+        参数:
+        - image_data: 图片字节数据
+        - model: 模型名称
+        - prompt: 分析提示词
+        
+        返回:
+        - Tuple[Optional[str], Dict]: (缓存的描述，未命中时为 None；供 store 复用的哈希信息)
+        """
+        image_sha = hashlib.sha256(image_data).hexdigest()
+        context = self.make_context(model, prompt)
+        key = f"{image_sha}-{context}"
+        hashes = {"sha": image_sha, "key": key, "context": context, "phash": None}
+        
+        # 精确层
+        try:
+            with open(self.cache_dir / f"{key}{_CACHE_SUFFIX}", "r", encoding="utf-8") as f:
+                description = json.load(f).get("description")
+            if description:
+                self._count("hits")
+                return description, hashes
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取图片分析缓存失败: {str(e)}, key={key}")
+        
+        # 语义层
+        if self.max_distance >= 0:
+            phash = dhash(image_data)
+            hashes["phash"] = phash
+            if phash is not None:
+                best_distance = self.max_distance + 1
+                best_description = None
+                with self._lock:
+                    for indexed_hash, indexed_context, description in self._index:
+                        if indexed_context != context:
+                            continue
+                        distance = (phash ^ indexed_hash).bit_count()
+                        if distance < best_distance:
+                            best_distance, best_description = distance, description
+                            if distance == 0:
+                                break
+                if best_description:
+                    logger.debug(f"图片分析语义缓存命中，汉明距离: {best_distance}")
+                    self._count("semantic_hits")
+                    return best_description, hashes
+        
+        self._count("misses")
+        return None, hashes
+    
+    def store(self, hashes: Dict, model: str, description: str) -> bool:
+        """
+        保存图片的分析结果
+        
+        参数:
+        - hashes: lookup 返回的哈希信息
+        - model: 模型名称
+        - description: 分析结果
+        
+        返回:
+        - bool: 保存成功返回 True
+        """
+        if not description:
+            return False
+        
+        record = {
+            "sha": hashes["sha"],
+            "phash": hashes.get("phash"),
+            "model": model,
+            "context": hashes["context"],
+            "description": description
+        }
+        path = self.cache_dir / f"{hashes['key']}{_CACHE_SUFFIX}"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入图片分析缓存失败: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+        
+        if record["phash"] is not None:
+            with self._lock:
+                self._index.append((record["phash"], record["context"], description))
+                if len(self._index) > _INDEX_LIMIT:
+                    del self._index[0]
+        return True
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取缓存命中统计
+        
+        返回:
+        - Dict[str, int]: 包含 hits、semantic_hits 和 misses 的字典
+        """
+        with self._lock:
+            return dict(self.stats)
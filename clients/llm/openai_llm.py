@@ -8,6 +8,13 @@ from typing import Any, Dict, List, Set, Optional, AsyncIterator, Union
 
 from .abstract_llm import LLMClient, LLMClientError
 
+# 安装 h2 后使用 HTTP/2，并发的图片分析流复用同一条连接
+try:
+    import h2
+    HTTP2_SUPPORT = True
+except ImportError:
+    HTTP2_SUPPORT = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,6 +71,9 @@ class OpenAILLMClient(LLMClient):
                 model_kwargs["base_url"] = base_url
                 logger.info(f"使用自定义 OpenAI API 基础 URL: {base_url}")
             
+            # 使用带连接池的 HTTP 客户端，并发请求复用连接
+            model_kwargs.update(self._create_http_clients(model_kwargs["timeout"]))
+            
             self.model = ChatOpenAI(**model_kwargs)
             logger.info(f"已初始化 OpenAI LLM 客户端 (模型: {model_name})")
             
@@ -80,6 +90,27 @@ class OpenAILLMClient(LLMClient):
             logger.error(f"初始化 OpenAI LLM 客户端失败: {str(e)}")
             raise LLMClientError(f"初始化 OpenAI LLM 客户端失败: {str(e)}")
     
+    @staticmethod
+    def _create_http_clients(timeout: float) -> Dict[str, Any]:
+        """
+        创建同步和异步 HTTP 客户端
+        
+        参数:
+        - timeout: 请求超时时间（秒）
+        
+        返回:
+        - Dict[str, Any]: ChatOpenAI 的 http_client 和 http_async_client 参数
+        """
+        import httpx
+        
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        if HTTP2_SUPPORT:
+            logger.debug("OpenAI HTTP 客户端已启用 HTTP/2")
+        return {
+            "http_client": httpx.Client(http2=HTTP2_SUPPORT, limits=limits, timeout=timeout),
+            "http_async_client": httpx.AsyncClient(http2=HTTP2_SUPPORT, limits=limits, timeout=timeout),
+        }
+    
     @property
     def runtime_capabilities(self) -> Set[str]:
         """返回当前客户端实例运行时实际可用的能力集合"""
@@ -181,13 +212,15 @@ class OpenAILLMClient(LLMClient):
             # 获取或使用默认的分析提示词
             prompt = kwargs.get("analysis_prompt", self.get_default_prompt())
             
-            full_response = ""
             logger.info(f"开始分析图片: {img_id}")
             
             # 根据日志级别决定是否输出打字效果
-            if self.should_print_typing_output():
-                print(f"\n开始分析图片 {img_id} ...", end="", flush=True)
+            typing_output = self.should_print_typing_output()
+            typing_buffer = self.create_typing_buffer() if typing_output else None
+            if typing_output:
+                self.write_typing_output(f"\n开始分析图片 {img_id} ...")
             
+            parts = []
             for chunk in self.model.stream([
                 HumanMessage(content=[
                     {"type": "text", "text": prompt},
@@ -197,17 +230,18 @@ class OpenAILLMClient(LLMClient):
                 ])
             ]):
                 if hasattr(chunk, 'content'):
-                    content = chunk.content
-                    full_response += content
+                    parts.append(chunk.content)
                     
                     # 根据日志级别决定是否输出打字效果
-                    if self.should_print_typing_output():
-                        print(content, end="", flush=True)
+                    if typing_buffer:
+                        typing_buffer.write(chunk.content)
+            full_response = "".join(parts)
             
             # 根据日志级别决定是否输出完成信息
-            if self.should_print_typing_output():
-                print("\n图片分析完成\n", flush=True)
-                
+            if typing_buffer:
+                typing_buffer.flush()
+                self.write_typing_output("\n图片分析完成\n", end="\n")
+            
             logger.info(f"图片 {img_id} 分析完成")
             return full_response
         except Exception as e:
@@ -231,11 +265,13 @@ class OpenAILLMClient(LLMClient):
             logger.info(f"开始分析远程图片: {image_url}")
             
             # 根据日志级别决定是否输出打字效果
-            if self.should_print_typing_output():
-                print(f"\n开始分析图片 (URL模式) ...", end="", flush=True)
+            typing_output = self.should_print_typing_output()
+            typing_buffer = self.create_typing_buffer() if typing_output else None
+            if typing_output:
+                self.write_typing_output(f"\n开始分析图片 (URL模式) ...")
             
             # 流式处理
-            full_response = ""
+            parts = []
             for chunk in self.model.stream([
                 HumanMessage(content=[
                     {"type": "text", "text": prompt},
@@ -243,23 +279,95 @@ class OpenAILLMClient(LLMClient):
                 ])
             ]):
                 if hasattr(chunk, 'content'):
-                    content = chunk.content
-                    full_response += content
+                    parts.append(chunk.content)
                     
                     # 根据日志级别决定是否输出打字效果
-                    if self.should_print_typing_output():
-                        print(content, end="", flush=True)
+                    if typing_buffer:
+                        typing_buffer.write(chunk.content)
+            full_response = "".join(parts)
             
             # 根据日志级别决定是否输出完成信息
-            if self.should_print_typing_output():
-                print("\n图片分析完成\n", flush=True)
+            if typing_buffer:
+                typing_buffer.flush()
+                self.write_typing_output("\n图片分析完成\n", end="\n")
             
             logger.info(f"远程图片 URL 分析完成")
             return full_response
-            
+        
         except Exception as e:
             logger.error(f"远程图片分析失败: {str(e)}")
             raise LLMClientError(f"远程图片分析失败: {str(e)}")
+    
+    async def _astream_content(self, messages: List[Any]) -> str:
+        """异步流式调用模型并拼接完整响应"""
+        parts = []
+        # 根据日志级别决定是否输出打字效果
+        typing_buffer = self.create_typing_buffer() if self.should_print_typing_output() else None
+        async for chunk in self.model.astream(messages):
+            if hasattr(chunk, 'content'):
+                parts.append(chunk.content)
+                
+                if typing_buffer:
+                    typing_buffer.write(chunk.content)
+        if typing_buffer:
+            typing_buffer.flush()
+        return "".join(parts)
+    
+    async def aanalyze_image_streaming(self, image_base64: str, img_id: str, **kwargs) -> str:
+        """使用 astream 异步流式分析图片内容"""
+        if not self.model:
+            raise LLMClientError("OpenAI 模型未初始化")
+        
+        if "image_analysis" not in self.runtime_capabilities:
+            raise LLMClientError("当前模型不支持图片分析功能")
+            
+        try:
+            from langchain_core.messages import HumanMessage
+            
+            prompt = kwargs.get("analysis_prompt", self.get_default_prompt())
+            logger.info(f"开始分析图片: {img_id}")
+            
+            full_response = await self._astream_content([
+                HumanMessage(content=[
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {
+                        "url": f"data:image/jpeg;base64,{image_base64}"
+                    }}
+                ])
+            ])
+            
+            logger.info(f"图片 {img_id} 分析完成")
+            return full_response
+        except Exception as e:
+            logger.error(f"图片异步流式分析失败: {str(e)}")
+            raise LLMClientError(f"图片异步流式分析失败: {str(e)}")
+    
+    async def aanalyze_image_url(self, image_url: str, analysis_prompt: Optional[str] = None, **kwargs) -> str:
+        """使用 astream 通过远程 URL 异步分析图片内容"""
+        if not self.model:
+            raise LLMClientError("OpenAI 模型未初始化")
+        
+        if "image_analysis" not in self.runtime_capabilities:
+            raise LLMClientError("当前模型不支持图片分析功能")
+            
+        try:
+            from langchain_core.messages import HumanMessage
+            
+            prompt = analysis_prompt or self.get_default_prompt()
+            logger.info(f"开始分析远程图片: {image_url}")
+            
+            full_response = await self._astream_content([
+                HumanMessage(content=[
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image_url}}
+                ])
+            ])
+            
+            logger.info(f"远程图片 URL 分析完成")
+            return full_response
+        except Exception as e:
+            logger.error(f"远程图片异步分析失败: {str(e)}")
+            raise LLMClientError(f"远程图片异步分析失败: {str(e)}")
             
     def get_default_prompt(self) -> str:
         """重写默认提示词"""
@@ -2,7 +2,12 @@
 OCR 客户端模块，提供各种 OCR 服务的统一接口
 """
 
-from .abstract_client import OCRClient
+from .abstract_client import OCRClient, OCRClientError, OCRRateLimitError, OCRTransientError
 from .mistral_client import MistralOCRClient
+from .cache import OCRCache
+from .rate_limiter import AdaptiveRateLimiter
 
-__all__ = ['OCRClient', 'MistralOCRClient'] 
\ No newline at end of file
+__all__ = [
+    'OCRClient', 'OCRClientError', 'OCRRateLimitError', 'OCRTransientError', 'MistralOCRClient',
+    'OCRCache', 'AdaptiveRateLimiter'
+] 
\ No newline at end of file
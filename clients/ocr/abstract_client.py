@@ -4,7 +4,7 @@ OCR 客户端抽象接口
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 
 class OCRClientError(Exception):
@@ -12,6 +12,16 @@ class OCRClientError(Exception):
     pass
 
 
+class OCRRateLimitError(OCRClientError):
+    """OCR 服务速率限制错误"""
+    pass
+
+
+class OCRTransientError(OCRClientError):
+    """OCR 服务暂时不可用错误（超时、网关错误等），稍后重试可能成功"""
+    pass
+
+
 class OCRClient(ABC):
     """
     OCR 客户端抽象接口
@@ -39,4 +49,28 @@ class OCRClient(ABC):
         抛出:
         - OCRClientError: 处理失败
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    def upload_document(self, file_path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        以流式方式上传本地文档，供 process 通过引用处理，避免将文件编码为 base64
+        
+        参数:
+        - file_path: 本地文件路径
+        
+        返回:
+        - (上传文件ID, 可传给 process 的文档数据)，不支持上传时返回 None
+        
+        抛出:
+        - OCRClientError: 上传失败
+        """
+        return None
+    
+    def delete_document(self, file_id: str) -> None:
+        """
+        删除通过 upload_document 上传的文档
+        
+        参数:
+        - file_id: 上传文件ID
+        """
+        pass
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+OCR 结果磁盘缓存
+按 PDF 内容哈希缓存 OCR 响应，重复转换同一文件时跳过 OCR 调用
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import functools
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Union
+
+# 优先使用 orjson 解析缓存，未安装时回退到标准库 json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# 计算文件哈希时每次读取的字节数
+_HASH_CHUNK_SIZE = 1024 * 1024
+_CACHE_SUFFIX = ".json.gz"
+# 文件哈希结果的缓存条目数
+_HASH_MEMO_SIZE = 4096
+
+
+def _new_file_hasher():
+    """创建计算 PDF 内容哈希用的 BLAKE2b 对象"""
+    return hashlib.blake2b(digest_size=16)
+
+
+@functools.lru_cache(maxsize=_HASH_MEMO_SIZE)
+def _hash_file_cached(file_path: str, mtime_ns: int, size: int) -> str:
+    """
+    计算文件内容的哈希值，修改时间和大小作为缓存键的一部分，文件变化后重新计算
+    
+    参数:
+    - file_path: 文件绝对路径
+    - mtime_ns: 文件修改时间（纳秒）
+    - size: 文件大小
+    
+    返回:
+    - str: 32 位十六进制摘要
+    """
+    with open(file_path, "rb") as f:
+        # Python 3.11+ 的 file_digest 在 C 层直接读取文件并计算哈希，不经过 Python 层的分块循环
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, _new_file_hasher).hexdigest()
+        digest = _new_file_hasher()
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_response_model():
+    """
+    延迟导入 Mistral SDK 的响应模型，用于从缓存还原与 API 返回一致的对象
+    
+    返回:
+    - OCRResponse 类，未安装 Mistral SDK 时返回 None
+    """
+    try:
+        from mistralai.models import OCRResponse
+        return OCRResponse
+    except ImportError:
+        return None
+
+
+def _to_namespace(value: Any) -> Any:
+    """将解析出的 JSON 对象递归转换为支持属性访问的 SimpleNamespace"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class OCRCache:
+    """
+    OCR 响应的内容寻址磁盘缓存
+    
+    缓存文件为 gzip 压缩的 JSON，文件名由 PDF 内容哈希、模型名和是否包含图片决定；
+    超过有效期的条目在读取时删除
+    """
+    
+    def __init__(self, cache_dir: Union[str, Path], ttl_days: int = 30):
+        """
+        初始化 OCR 缓存
+        
+        参数:
+        - cache_dir: 缓存目录
+        - ttl_days: 缓存有效期（天），0 表示永不过期
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = max(ttl_days, 0) * 86400
+        self.stats = {"hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+        logger.info(f"已启用OCR结果缓存，目录: {self.cache_dir}")
+    
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """
+        分块计算文件内容的哈希值
+        
+        结果按 (路径, 修改时间, 文件大小) 缓存，批量转换时查重和OCR缓存查找不会重复读取同一文件
+        
+        参数:
+        - file_path: 文件路径
+        
+        返回:
+        - str: 32 位十六进制摘要
+        """
+        st = os.stat(file_path)
+        return _hash_file_cached(os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+    
+    @staticmethod
+    def make_key(content_hash: str, model: str, include_image_base64: bool) -> str:
+        """
+        构建缓存键
+        
+        参数:
+        - content_hash: PDF 内容哈希
+        - model: OCR 模型名称
+        - include_image_base64: 是否包含图片的 base64 数据
+        
+        返回:
+        - str: 缓存键
+        """
+        return f"{model}-{content_hash}{'-img' if include_image_base64 else ''}"
+    
+    def _path(self, key: str) -> Path:
+        """获取缓存键对应的文件路径"""
+        return self.cache_dir / f"{key}{_CACHE_SUFFIX}"
+    
+    def _count(self, name: str) -> None:
+        """线程安全地更新命中统计"""
+        with self._stats_lock:
+            self.stats[name] += 1
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存的 OCR 响应
+        
+        参数:
+        - key: 缓存键
+        
+        返回:
+        - OCR 响应对象，未命中或已过期时返回 None
+        """
+        path = self._path(key)
+        try:
+            if self.ttl_seconds and time.time() - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                logger.debug(f"OCR缓存已过期: {key}")
+                self._count("misses")
+                return None
+            # 以字节读取并直接交给解析器，避免先解码为大字符串
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, EOFError) as e:
+            logger.warning(f"读取OCR缓存失败: {str(e)}, key={key}")
+            self._count("misses")
+            return None
+        
+        try:
+            response_model = _load_response_model()
+            if response_model is not None:
+                response = response_model.model_validate_json(data)
+            else:
+                response = _to_namespace(_json_loads(data))
+        except Exception as e:
+            logger.warning(f"解析OCR缓存失败: {str(e)}, key={key}")
+            self._count("misses")
+            return None
+        
+        self._count("hits")
+        return response
+    
+    def set(self, key: str, response: Any) -> bool:
+        """
+        写入 OCR 响应到缓存
+        
+        参数:
+        - key: 缓存键
+        - response: OCR 响应对象（需支持 model_dump_json）
+        
+        返回:
+        - bool: 写入成功返回 True
+        """
+        if not hasattr(response, "model_dump_json"):
+            logger.debug(f"OCR响应不支持序列化，跳过缓存: {type(response).__name__}")
+            return False
+        
+        # Pydantic 模型直接序列化为 JSON 字节串，省去 model_dump_json 的解码和重新编码
+        serializer = getattr(response, "__pydantic_serializer__", None)
+        if serializer is not None:
+            payload = serializer.to_json(response)
+        else:
+            payload = response.model_dump_json().encode("utf-8")
+        
+        path = self._path(key)
+        # 先写临时文件再替换，避免并发读取到不完整的文件
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"写入OCR缓存失败: {str(e)}, key={key}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+    
+    def evict_expired(self) -> int:
+        """
+        删除所有过期的缓存文件
+        
+        返回:
+        - int: 删除的文件数
+        """
+        if not self.ttl_seconds:
+            return 0
+        
+        deadline = time.time() - self.ttl_seconds
+        removed = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(_CACHE_SUFFIX) and entry.stat().st_mtime < deadline:
+                    try:
+                        os.unlink(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取缓存命中统计
+        
+        返回:
+        - Dict[str, int]: 包含 hits 和 misses 的字典
+        """
+        with self._stats_lock:
+            return dict(self.stats)
@@ -3,14 +3,19 @@ Mistral OCR 客户端实现
 封装 Mistral SDK 的 OCR 功能
 """
 
+import os
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-from mistralai import Mistral
-from .abstract_client import OCRClient, OCRClientError
+from .abstract_client import OCRClient, OCRClientError, OCRRateLimitError, OCRTransientError
 
 logger = logging.getLogger(__name__)
 
+# 可重试的 HTTP 状态码: 请求超时和服务端暂时不可用
+_TRANSIENT_STATUS_CODES = frozenset((408, 425, 500, 502, 503, 504))
+# 可重试的网络错误关键字
+_TRANSIENT_MESSAGES = ("timeout", "timed out", "temporarily unavailable", "connection reset", "connection aborted")
+
 
 class MistralOCRClient(OCRClient):
     """
@@ -26,6 +31,9 @@ class MistralOCRClient(OCRClient):
         - api_key: Mistral API 密钥
         """
         try:
+            # 延迟导入 Mistral SDK，只在实际创建客户端时承担导入开销
+            from mistralai import Mistral
+            
             self.client = Mistral(api_key=api_key)
             self.ocr = self.client.ocr
             logger.info("已初始化 Mistral OCR 客户端")
@@ -61,14 +69,59 @@ class MistralOCRClient(OCRClient):
             )
         except Exception as e:
             error_message = str(e).lower()
+            status_code = getattr(e, "status_code", None)
             
             # 分类错误类型
             if "api key" in error_message or "authentication" in error_message:
                 logger.error(f"Mistral API 认证错误: {str(e)}")
                 raise OCRClientError(f"Mistral API 认证错误: {str(e)}")
-            elif "rate limit" in error_message or "too many requests" in error_message:
+            # 优先使用 SDK 异常的状态码，消息中恰好含 "429" 的其他错误不视为限速；没有状态码时才按消息文本判断
+            elif status_code == 429 or (status_code is None and (
+                    "rate limit" in error_message or "too many requests" in error_message)):
                 logger.error(f"Mistral API 速率限制: {str(e)}")
-                raise OCRClientError(f"Mistral API 速率限制: {str(e)}")
+                raise OCRRateLimitError(f"Mistral API 速率限制: {str(e)}")
+            elif status_code in _TRANSIENT_STATUS_CODES or any(m in error_message for m in _TRANSIENT_MESSAGES):
+                logger.warning(f"Mistral OCR 暂时不可用: {str(e)}")
+                raise OCRTransientError(f"Mistral OCR 暂时不可用: {str(e)}")
             else:
                 logger.error(f"Mistral OCR 处理失败: {str(e)}")
-                raise OCRClientError(f"Mistral OCR 处理失败: {str(e)}") 
\ No newline at end of file
+                raise OCRClientError(f"Mistral OCR 处理失败: {str(e)}")
+    
+    def upload_document(self, file_path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        通过 Mistral Files API 上传文档，返回签名 URL 形式的文档数据
+        
+        参数:
+        - file_path: 本地文件路径
+        
+        返回:
+        - (上传文件ID, 文档数据)
+        
+        抛出:
+        - OCRClientError: 上传失败
+        """
+        try:
+            # SDK 以 multipart 流式发送文件对象，不需要把整个文件读入内存
+            with open(file_path, "rb") as f:
+                uploaded = self.client.files.upload(
+                    file={"file_name": os.path.basename(file_path), "content": f},
+                    purpose="ocr"
+                )
+            signed_url = self.client.files.get_signed_url(file_id=uploaded.id)
+            logger.debug(f"文档已上传到 Mistral: {uploaded.id}")
+            return uploaded.id, {"type": "document_url", "document_url": signed_url.url}
+        except Exception as e:
+            logger.error(f"上传文档到 Mistral 失败: {str(e)}")
+            raise OCRClientError(f"上传文档到 Mistral 失败: {str(e)}")
+    
+    def delete_document(self, file_id: str) -> None:
+        """
+        删除上传到 Mistral 的文档
+        
+        参数:
+        - file_id: 上传文件ID
+        """
+        try:
+            self.client.files.delete(file_id=file_id)
+        except Exception as e:
+            logger.warning(f"删除 Mistral 上传文档失败: {str(e)}, file_id={file_id}")
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+OCR 请求速率限制
+基于令牌桶限制单位时间内的 OCR 请求数，收到速率限制错误时自动降低速率，请求成功后逐步恢复
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 触发速率限制后速率降低的比例
+_DECREASE_FACTOR = 0.5
+# 每次请求成功后速率恢复的比例（相对于最大速率）
+_RECOVERY_STEP = 0.1
+# 速率下限（相对于最大速率）
+_MIN_RATE_RATIO = 0.05
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶限速器
+    
+    令牌按当前速率持续补充，桶容量等于每分钟请求数的上限；
+    调用 on_rate_limited 后当前速率减半，调用 on_success 后按固定步长恢复到上限
+    """
+    
+    def __init__(self, requests_per_minute: float):
+        """
+        初始化限速器
+        
+        参数:
+        - requests_per_minute: 每分钟允许的最大请求数
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute 必须大于 0")
+        self.max_rate = requests_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(requests_per_minute, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float) -> None:
+        """按经过的时间补充令牌，调用方需持有锁"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self) -> float:
+        """
+        获取一个令牌，令牌不足时阻塞等待
+        
+        返回:
+        - float: 等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+    
+    def on_rate_limited(self) -> None:
+        """收到速率限制错误时降低速率并清空令牌桶"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.rate * _DECREASE_FACTOR, self.max_rate * _MIN_RATE_RATIO)
+            self._tokens = min(self._tokens, 0.0)
+            logger.warning(f"OCR请求触发速率限制，速率降低为每分钟 {self.rate * 60:.1f} 次")
+    
+    def on_success(self) -> None:
+        """请求成功后逐步恢复速率"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * _RECOVERY_STEP)
@@ -5,6 +5,7 @@
 import os
 import re
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, Any, List, Set, Optional, Union
 try:
@@ -16,6 +17,9 @@ from clients.prompts.abstract_prompt import PromptTemplate, PromptLoader, Prompt
 
 logger = logging.getLogger(__name__)
 
+# 解析失败时用于提取 {{ 变量 }} 的备选正则
+_VARIABLE_RE = re.compile(r'{{\s*(\w+)\s*}}')
+
 
 class Jinja2PromptTemplate(PromptTemplate):
     """基于Jinja2的提示词模板实现"""
@@ -63,8 +67,7 @@ class Jinja2PromptTemplate(PromptTemplate):
         except Exception as e:
             logger.warning(f"提取模板变量失败 '{self.template_name}': {str(e)}")
             # 使用简单的正则表达式作为备选方案
-            pattern = r'{{\s*(\w+)\s*}}'
-            matches = re.findall(pattern, self.template_string)
+            matches = _VARIABLE_RE.findall(self.template_string)
             return sorted(list(set(matches)))
     
     def render(self, params: Dict[str, Any]) -> str:
@@ -123,6 +126,7 @@ class Jinja2PromptLoader(PromptLoader):
         """
         super().__init__(template_dir)
         self.template_cache = {}  # 模板缓存
+        self._cache_lock = threading.Lock()
         
     def load(self, template_name: str) -> PromptTemplate:
         """
@@ -144,6 +148,9 @@ class Jinja2PromptLoader(PromptLoader):
         # 确保文件名有.j2后缀
         if not template_name.endswith('.j2'):
             template_name = f"{template_name}.j2"
+            cached = self.template_cache.get(template_name)
+            if cached is not None:
+                return cached
             
         template_path = self.template_dir / template_name
         if not template_path.exists():
@@ -160,9 +167,9 @@ class Jinja2PromptLoader(PromptLoader):
                 template_name=template_name
             )
             
-            # 缓存模板
-            self.template_cache[template_name] = template
-            return template
+            # 缓存模板（并发加载时保留先写入的实例）
+            with self._cache_lock:
+                return self.template_cache.setdefault(template_name, template)
         except Exception as e:
             error_msg = f"加载模板 '{template_name}' 失败: {str(e)}"
             logger.error(error_msg)
@@ -189,7 +196,8 @@ class Jinja2PromptLoader(PromptLoader):
             )
             
             # 缓存模板
-            self.template_cache[name] = template
+            with self._cache_lock:
+                self.template_cache[name] = template
             return template
         except Exception as e:
             error_msg = f"从字符串创建模板 '{name}' 失败: {str(e)}"
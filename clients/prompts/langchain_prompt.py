@@ -4,6 +4,7 @@
 import os
 import re
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Set, Union
 
@@ -16,6 +17,9 @@ from clients.prompts.abstract_prompt import PromptTemplate, PromptLoader, Prompt
 
 logger = logging.getLogger(__name__)
 
+# 模板中 {变量} 格式的占位符
+_VARIABLE_RE = re.compile(r'\{([^{}]+)\}')
+
 
 class LangChainPromptTemplate(PromptTemplate):
     """LangChain提示词模板实现"""
@@ -50,7 +54,7 @@ class LangChainPromptTemplate(PromptTemplate):
         """
         try:
             # 查找模板中的所有 {variable} 格式的变量
-            variables = set(re.findall(r'\{([^{}]+)\}', self.template_string))
+            variables = set(_VARIABLE_RE.findall(self.template_string))
             return variables
         except Exception as e:
             raise PromptError(f"提取模板变量时发生错误: {str(e)}")
@@ -114,6 +118,7 @@ class LangChainPromptLoader(PromptLoader):
         """
         super().__init__(template_dir)
         self._template_cache: Dict[str, LangChainPromptTemplate] = {}
+        self._cache_lock = threading.Lock()
     
     def load(self, template_name: str) -> LangChainPromptTemplate:
         """
@@ -150,8 +155,9 @@ class LangChainPromptLoader(PromptLoader):
             
             template = LangChainPromptTemplate(template_string, template_name)
             
-            # 缓存模板
-            self._template_cache[template_name] = template
+            # 缓存模板（并发加载时保留先写入的实例）
+            with self._cache_lock:
+                template = self._template_cache.setdefault(template_name, template)
             
             logger.debug(f"成功加载模板 '{template_name}'")
             return template
@@ -179,7 +185,8 @@ class LangChainPromptLoader(PromptLoader):
             template = LangChainPromptTemplate(template_string, name)
             
             # 缓存模板
-            self._template_cache[name] = template
+            with self._cache_lock:
+                self._template_cache[name] = template
             
             logger.debug(f"成功注册字符串模板 '{name}'")
             return template
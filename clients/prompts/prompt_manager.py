@@ -4,6 +4,7 @@
 
 import os
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Type, Union
 
@@ -23,6 +24,12 @@ class PromptManager:
         "langchain": LangChainPromptLoader
     }
     
+    # 各加载器类型对应的模板文件扩展名
+    TEMPLATE_EXTENSIONS = {
+        "jinja2": ".j2",
+        "langchain": ".txt"
+    }
+    
     def __init__(self, base_dir: Union[str, Path], default_type: str = "jinja2"):
         """
         初始化提示词管理器
@@ -48,6 +55,7 @@ class PromptManager:
         
         self.default_type = default_type
         self.loaders: Dict[str, PromptLoader] = {}
+        self._init_lock = threading.Lock()
         
         # 初始化默认加载器
         self._init_loader(default_type)
@@ -62,26 +70,34 @@ class PromptManager:
         返回:
             加载器实例
         """
-        if loader_type in self.loaders:
-            return self.loaders[loader_type]
-        
-        # 确保加载器目录存在
-        loader_dir = self.base_dir / loader_type
-        if not loader_dir.exists():
-            logger.info(f"创建加载器目录: {loader_dir}")
-            os.makedirs(loader_dir, exist_ok=True)
-        
-        # 创建加载器实例
-        try:
-            loader_class = self.LOADER_TYPES[loader_type]
-            loader = loader_class(loader_dir)
-            self.loaders[loader_type] = loader
-            logger.debug(f"初始化加载器 '{loader_type}' 成功")
+        # 快速路径：加载器已初始化时无需加锁
+        loader = self.loaders.get(loader_type)
+        if loader is not None:
             return loader
-        except Exception as e:
-            error_msg = f"初始化加载器 '{loader_type}' 失败: {str(e)}"
-            logger.error(error_msg)
-            raise PromptError(error_msg) from e
+        
+        with self._init_lock:
+            # 双重检查，避免多个线程重复创建加载器
+            loader = self.loaders.get(loader_type)
+            if loader is not None:
+                return loader
+            
+            # 确保加载器目录存在
+            loader_dir = self.base_dir / loader_type
+            if not loader_dir.exists():
+                logger.info(f"创建加载器目录: {loader_dir}")
+                os.makedirs(loader_dir, exist_ok=True)
+            
+            # 创建加载器实例
+            try:
+                loader_class = self.LOADER_TYPES[loader_type]
+                loader = loader_class(loader_dir)
+                self.loaders[loader_type] = loader
+                logger.debug(f"初始化加载器 '{loader_type}' 成功")
+                return loader
+            except Exception as e:
+                error_msg = f"初始化加载器 '{loader_type}' 失败: {str(e)}"
+                logger.error(error_msg)
+                raise PromptError(error_msg) from e
     
     def get_template(self, template_name: str, loader_type: Optional[str] = None) -> PromptTemplate:
         """
@@ -154,6 +170,49 @@ class PromptManager:
         loader = self._init_loader(loader_type)
         return loader.register_string_template(name, template_string)
     
+    def precompile(self, template_names: Optional[List[str]] = None,
+                   loader_type: Optional[str] = None) -> List[str]:
+        """
+        预编译模板，将编译开销从首次请求提前到服务启动阶段
+        
+        参数:
+            template_names: 模板名称列表，如果为None则加载加载器目录下的所有模板
+            loader_type: 加载器类型，如果为None则使用默认加载器
+            
+        返回:
+            成功预编译的模板名称列表
+        
+        异常:
+            PromptError: 如果加载器类型不受支持
+        """
+        loader_type = loader_type or self.default_type
+        
+        if loader_type not in self.LOADER_TYPES:
+            supported = ", ".join(self.LOADER_TYPES.keys())
+            error_msg = f"不支持的加载器类型: {loader_type}，支持的类型: {supported}"
+            logger.error(error_msg)
+            raise PromptError(error_msg)
+        
+        loader = self._init_loader(loader_type)
+        
+        if template_names is None:
+            ext = self.TEMPLATE_EXTENSIONS.get(loader_type)
+            if not ext:
+                logger.warning(f"加载器类型 '{loader_type}' 未声明模板扩展名，跳过预编译")
+                return []
+            template_names = sorted(p.stem for p in (self.base_dir / loader_type).glob(f"*{ext}"))
+        
+        compiled = []
+        for name in template_names:
+            try:
+                loader.load(name)
+                compiled.append(name)
+            except PromptError as e:
+                logger.warning(f"预编译模板 '{name}' 失败: {str(e)}")
+        
+        logger.info(f"预编译 {loader_type} 模板 {len(compiled)}/{len(template_names)} 个")
+        return compiled
+    
     @classmethod
     def register_loader_type(cls, name: str, loader_class: Type[PromptLoader]) -> None:
         """
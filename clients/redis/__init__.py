@@ -3,6 +3,6 @@ Redis 客户端模块
 提供Redis数据缓存功能
 """
 
-from .client import RedisClient, RedisError
+from .client import RedisClient, RedisError, get_default_client
 
-__all__ = ['RedisClient', 'RedisError'] 
\ No newline at end of file
+__all__ = ['RedisClient', 'RedisError', 'get_default_client'] 
\ No newline at end of file
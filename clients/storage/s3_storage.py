@@ -7,9 +7,12 @@ S3 存储模块: 支持将文件上传到 S3 兼容的存储服务 (AWS S3, MinI
 
 import os
 import logging
+import threading
+import concurrent.futures
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
-from typing import Optional, Dict, List, Tuple, Union, Any
+from typing import Optional, Dict, Iterator, List, Tuple, Union, Any
 from pathlib import Path
 from urllib.parse import urljoin
 
@@ -18,6 +21,91 @@ from .abstract_storage import Storage, StorageError
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 分片上传参数: 超过阈值的文件按分片并行上传，小文件仍走单次 PUT
+_MB = 1024 * 1024
+_MULTIPART_THRESHOLD = 8 * _MB
+_MULTIPART_CHUNKSIZE = 8 * _MB
+_IO_CHUNKSIZE = 256 * 1024
+
+# 文件扩展名（小写）到内容类型的映射
+_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp',
+    '.tiff': 'image/tiff',
+    '.tif': 'image/tiff',
+    '.md': 'text/markdown',
+    '.html': 'text/html',
+    '.txt': 'text/plain',
+    '.pdf': 'application/pdf',
+    '.json': 'application/json',
+    '.js': 'application/javascript',
+    '.css': 'text/css'
+}
+_DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+# 客户端配置: 连接池上限与 upload_directory 的并发线程数匹配
+_MAX_POOL_CONNECTIONS = 50
+_S3_CONFIG = boto3.session.Config(max_pool_connections=_MAX_POOL_CONNECTIONS)
+# 对于 MinIO，通常使用 S3v4 签名和路径样式寻址
+_MINIO_CONFIG = boto3.session.Config(
+    signature_version='s3v4',
+    s3={'addressing_style': 'path'},
+    max_pool_connections=_MAX_POOL_CONNECTIONS
+)
+
+# 所有 S3Storage 实例共享同一个会话，避免重复加载端点数据和凭证链；
+# boto3 会话不是线程安全的，首次使用时创建，创建客户端时需持有锁
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _create_session_client(service_name: str, **kwargs: Any) -> Any:
+    """
+    使用共享会话创建客户端，创建后的客户端可在线程间共享
+    
+    参数:
+    - service_name: 服务名称
+    - kwargs: 传给 Session.client 的参数
+    
+    返回:
+    - botocore 客户端
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = boto3.session.Session()
+        return _SESSION.client(service_name, **kwargs)
+
+
+def _iter_files(root: str) -> Iterator[os.DirEntry]:
+    """
+    使用 os.scandir 递归遍历目录中的所有文件
+    
+    与 os.walk 行为一致：不进入指向目录的符号链接，无法读取的目录将被跳过
+    
+    参数:
+    - root: 根目录路径
+    
+    返回:
+    - 文件的 DirEntry 迭代器
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+        except OSError as e:
+            logger.warning(f"无法读取目录 {current}: {str(e)}")
+
 
 class S3Storage(Storage):
     """S3 兼容存储服务实现，支持 AWS S3 和 MinIO"""
@@ -39,10 +127,29 @@ class S3Storage(Storage):
             # 检查必要配置
             self._validate_config()
             
+            # 预先读取并规范化常用配置，避免在逐文件调用中重复查字典和处理字符串
+            self._bucket_name = self.config['bucket_name']
+            self._path_prefix = (self.config.get('path_prefix') or '').strip('/')
+            self._public_url_base = self.config.get('public_url_base')
+            self._endpoint_url = self.config.get('endpoint_url')  # 对于 AWS S3 可为空
+            self._region = self.config.get('region_name')
+            self._use_ssl = self.config.get('use_ssl', True)
+            # 公共URL前缀，get_public_url 只需拼接对象键
+            self._url_template = self._build_public_url('')
+            
             # 创建 S3 客户端
             self.s3_client = self._create_s3_client()
             
-            logger.info(f"S3存储模块已初始化，终端点: {self.config.get('endpoint_url', 'AWS默认')}")
+            # 传输配置，供 upload_file/upload_fileobj 复用
+            self._transfer_config = TransferConfig(
+                multipart_threshold=_MULTIPART_THRESHOLD,
+                multipart_chunksize=_MULTIPART_CHUNKSIZE,
+                max_concurrency=(os.cpu_count() or 1) * 2,
+                io_chunksize=_IO_CHUNKSIZE,
+                use_threads=True
+            )
+            
+            logger.info(f"S3存储模块已初始化，终端点: {self._endpoint_url or 'AWS默认'}")
         except Exception as e:
             logger.error(f"初始化 S3 存储失败: {str(e)}")
             raise StorageError(f"初始化 S3 存储失败: {str(e)}")
@@ -103,16 +210,17 @@ class S3Storage(Storage):
         # 获取配置
         access_key = self.config['access_key']
         secret_key = self.config['secret_key']
-        endpoint_url = self.config.get('endpoint_url')  # 对于 AWS S3 可为空
-        region_name = self.config.get('region_name')
-        use_ssl = self.config.get('use_ssl', True)
+        endpoint_url = self._endpoint_url
+        region_name = self._region
+        use_ssl = self._use_ssl
         
         # 创建 S3 客户端
         try:
             s3_client_args = {
                 'aws_access_key_id': access_key,
                 'aws_secret_access_key': secret_key,
-                'region_name': region_name
+                'region_name': region_name,
+                'config': _S3_CONFIG
             }
             
             # 如果设置了自定义端点 (MinIO)，则添加到参数
@@ -121,14 +229,10 @@ class S3Storage(Storage):
                     'endpoint_url': endpoint_url,
                     'use_ssl': use_ssl
                 })
-                # 对于 MinIO，通常使用路径样式寻址
                 if 'minio' in endpoint_url.lower():
-                    s3_client_args['config'] = boto3.session.Config(
-                        signature_version='s3v4',  # MinIO 支持 S3v4 签名
-                        s3={'addressing_style': 'path'}  # 路径样式 URL
-                    )
+                    s3_client_args['config'] = _MINIO_CONFIG
             
-            return boto3.client('s3', **s3_client_args)
+            return _create_session_client('s3', **s3_client_args)
             
         except Exception as e:
             logger.error(f"创建 S3 客户端失败: {str(e)}")
@@ -144,7 +248,7 @@ class S3Storage(Storage):
         抛出:
         - StorageError: 检查失败
         """
-        bucket_name = self.config['bucket_name']
+        bucket_name = self._bucket_name
         
         try:
             self.s3_client.head_bucket(Bucket=bucket_name)
@@ -158,11 +262,11 @@ class S3Storage(Storage):
                     create_args = {'Bucket': bucket_name}
                     
                     # 如果不是 AWS S3，不需要指定区域
-                    if self.config.get('endpoint_url'):
+                    if self._endpoint_url:
                         self.s3_client.create_bucket(**create_args)
                     else:
                         # AWS S3 创建桶需要区域配置
-                        region = self.config['region_name']
+                        region = self._region
                         location_constraint = {'LocationConstraint': region}
                         create_args['CreateBucketConfiguration'] = location_constraint
                         self.s3_client.create_bucket(**create_args)
@@ -194,8 +298,6 @@ class S3Storage(Storage):
         抛出:
         - StorageError: 上传失败
         """
-        bucket_name = self.config['bucket_name']
-        
         try:
             # 检查桶是否存在
             if not self.check_bucket_exists():
@@ -209,49 +311,10 @@ class S3Storage(Storage):
             # 如果没有指定远程路径，则使用文件名
             if not remote_path:
                 file_name = os.path.basename(local_file_path)
-                path_prefix = self.config.get('path_prefix', '').strip('/')
+                path_prefix = self._path_prefix
                 remote_path = f"{path_prefix}/{file_name}" if path_prefix else file_name
             
-            # 使用 boto3 的 upload_file 方法
-            extra_args = {}
-            
-            # 如果提供了内容类型，则添加到参数
-            if content_type:
-                extra_args['ContentType'] = content_type
-            else:
-                # 根据文件扩展名自动确定内容类型
-                _, ext = os.path.splitext(local_file_path)
-                if ext:
-                    content_type = self._get_content_type(ext)
-                    extra_args['ContentType'] = content_type
-            
-            # 如果不需要预签名URL，则设为公开读取     
-            if not presign_url:
-                extra_args['ACL'] = 'public-read'
-            
-            # 上传文件
-            logger.debug(f"正在上传文件 {local_file_path} 到 {bucket_name}/{remote_path}")
-            self.s3_client.upload_file(
-                Filename=local_file_path,
-                Bucket=bucket_name,
-                Key=remote_path,
-                ExtraArgs=extra_args
-            )
-            
-            logger.info(f"文件 {local_file_path} 上传到 S3 成功，对象键: {remote_path}")
-            
-            # 生成URL
-            if presign_url:
-                # 创建预签名URL
-                presigned_url = self.s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': bucket_name, 'Key': remote_path},
-                    ExpiresIn=expires_in
-                )
-                return presigned_url
-            else:
-                # 返回普通公共URL
-                return self.get_public_url(remote_path)
+            return self._upload_file_impl(local_file_path, remote_path, content_type, presign_url, expires_in)
             
         except Exception as e:
             logger.error(f"上传文件 {local_file_path} 到 S3 失败: {str(e)}")
@@ -261,6 +324,67 @@ class S3Storage(Storage):
                 raise
             raise StorageError(f"上传文件 {local_file_path} 到 S3 失败: {str(e)}")
     
+    def _upload_file_impl(self, local_file_path: str, remote_path: str, content_type: str = None,
+                          presign_url: bool = False, expires_in: int = 3600) -> str:
+        """
+        上传文件的内部实现，不检查存储桶和本地文件是否存在
+        
+        由 upload_file 在完成检查后调用，upload_directory 预先检查存储桶后直接批量调用
+        
+        参数:
+        - local_file_path: 本地文件路径
+        - remote_path: S3 中的对象键(路径)
+        - content_type: 文件内容类型，为空时根据扩展名确定
+        - presign_url: 是否返回预签名URL而不是公开URL
+        - expires_in: 预签名URL的有效期（秒）
+        
+        返回:
+        - 文件的公共URL或预签名URL
+        """
+        bucket_name = self._bucket_name
+        
+        # 使用 boto3 的 upload_file 方法
+        extra_args = {}
+        
+        # 如果提供了内容类型，则添加到参数
+        if content_type:
+            extra_args['ContentType'] = content_type
+        else:
+            # 根据文件扩展名自动确定内容类型
+            _, ext = os.path.splitext(local_file_path)
+            if ext:
+                content_type = self._get_content_type(ext)
+                extra_args['ContentType'] = content_type
+        
+        # 如果不需要预签名URL，则设为公开读取     
+        if not presign_url:
+            extra_args['ACL'] = 'public-read'
+        
+        # 上传文件
+        logger.debug(f"正在上传文件 {local_file_path} 到 {bucket_name}/{remote_path}")
+        self.s3_client.upload_file(
+            Filename=local_file_path,
+            Bucket=bucket_name,
+            Key=remote_path,
+            ExtraArgs=extra_args,
+            Config=self._transfer_config
+        )
+        
+        logger.info(f"文件 {local_file_path} 上传到 S3 成功，对象键: {remote_path}")
+        
+        # 生成URL
+        if presign_url:
+            # 创建预签名URL
+            presigned_url = self.s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': bucket_name, 'Key': remote_path},
+                ExpiresIn=expires_in
+            )
+            return presigned_url
+        else:
+            # 返回普通公共URL
+            return self.get_public_url(remote_path)
+    
     def get_public_url(self, remote_path: str) -> str:
         """
         获取对象的公共 URL
@@ -268,12 +392,27 @@ class S3Storage(Storage):
         参数:
         - remote_path: S3 中的对象键(路径)
         
+        返回:
+        - 对象的公共URL
+        """
+        # 以 / 开头的对象键需要 urljoin 按公共URL基础地址的根路径解析
+        if self._public_url_base and remote_path.startswith('/'):
+            return self._build_public_url(remote_path)
+        return self._url_template + remote_path
+    
+    def _build_public_url(self, remote_path: str) -> str:
+        """
+        根据配置逐项构建对象的公共 URL
+        
+        参数:
+        - remote_path: S3 中的对象键(路径)
+        
         返回:
         - 对象的公共URL
         """
         # 如果配置了公共URL基础地址，则使用它
-        public_url_base = self.config.get('public_url_base')
-        bucket_name = self.config['bucket_name']
+        public_url_base = self._public_url_base
+        bucket_name = self._bucket_name
         
         if public_url_base:
             # 确保 URL 以斜杠结尾
@@ -284,11 +423,11 @@ class S3Storage(Storage):
             return urljoin(public_url_base, remote_path)
         else:
             # 否则使用 S3 端点构建 URL
-            endpoint_url = self.config.get('endpoint_url')
+            endpoint_url = self._endpoint_url
             
             # AWS S3 的默认 URL 格式
             if not endpoint_url:
-                region = self.config.get('region_name', 'us-east-1')
+                region = self._region or 'us-east-1'
                 return f"https://{bucket_name}.s3.{region}.amazonaws.com/{remote_path}"
             
             # 自定义端点 (如 MinIO) 的 URL 格式
@@ -305,16 +444,17 @@ class S3Storage(Storage):
                 clean_endpoint += '/'
                 
             # 构建完整 URL
-            protocol = 'https' if self.config.get('use_ssl', True) else 'http'
+            protocol = 'https' if self._use_ssl else 'http'
             return f"{protocol}://{clean_endpoint}{bucket_name}/{remote_path}"
     
-    def upload_directory(self, local_dir: str, remote_prefix: str = "") -> Dict[str, str]:
+    def upload_directory(self, local_dir: str, remote_prefix: str = "", max_workers: int = 16) -> Dict[str, str]:
         """
         上传整个目录到 S3 存储
         
         参数:
         - local_dir: 本地目录路径
         - remote_prefix: S3 中的路径前缀
+        - max_workers: 并行上传的最大线程数
         
         返回:
         - 字典，键为本地文件路径，值为 S3 公共URL
@@ -326,9 +466,13 @@ class S3Storage(Storage):
         if not os.path.isdir(local_dir):
             logger.error(f"目录不存在: {local_dir}")
             raise StorageError(f"目录不存在: {local_dir}")
+        
+        # 存储桶只需检查一次，之后的文件直接上传
+        if not self.check_bucket_exists():
+            return {}
             
         result = {}
-        path_prefix = self.config.get('path_prefix', '').strip('/')
+        path_prefix = self._path_prefix
         
         # 构建完整的 S3 前缀
         if path_prefix:
@@ -339,30 +483,40 @@ class S3Storage(Storage):
         else:
             full_prefix = remote_prefix
         
-        # 递归上传目录中的所有文件
-        for root, _, files in os.walk(local_dir):
-            for file in files:
-                local_file_path = os.path.join(root, file)
-                
-                # 计算文件的相对路径
-                rel_path = os.path.relpath(local_file_path, local_dir)
-                
-                # 构建 S3 对象键
-                if full_prefix:
-                    s3_key = f"{full_prefix}/{rel_path}"
-                else:
-                    s3_key = rel_path
-                
-                # 处理 Windows 路径分隔符
-                s3_key = s3_key.replace('\\', '/')
-                
-                # 根据文件扩展名确定内容类型
-                _, ext = os.path.splitext(file)
-                content_type = self._get_content_type(ext)
-                
+        # 收集目录中所有待上传的文件
+        # 文件路径均以 local_dir 为前缀，相对路径直接通过切片得到
+        root_len = len(os.path.join(local_dir, ''))
+        key_prefix = f"{full_prefix}/" if full_prefix else ""
+        convert_sep = os.sep != '/'
+        upload_tasks = []
+        for entry in _iter_files(local_dir):
+            rel_path = entry.path[root_len:]
+            
+            # 处理 Windows 路径分隔符
+            if convert_sep:
+                rel_path = rel_path.replace(os.sep, '/')
+            
+            # 根据文件扩展名确定内容类型
+            ext = os.path.splitext(entry.name)[1].lower()
+            content_type = _CONTENT_TYPES.get(ext, _DEFAULT_CONTENT_TYPE)
+            
+            upload_tasks.append((entry.path, f"{key_prefix}{rel_path}", content_type))
+        
+        if not upload_tasks:
+            logger.info("目录中没有需要上传的文件")
+            return result
+        
+        # 使用线程池并行上传
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(upload_tasks))) as executor:
+            futures = {
+                executor.submit(self._upload_file_impl, local_file_path, s3_key, content_type): local_file_path
+                for local_file_path, s3_key, content_type in upload_tasks
+            }
+            
+            for future in concurrent.futures.as_completed(futures):
+                local_file_path = futures[future]
                 try:
-                    # 上传文件
-                    public_url = self.upload_file(local_file_path, s3_key, content_type)
+                    public_url = future.result()
                     if public_url:
                         result[local_file_path] = public_url
                 except Exception as e:
@@ -374,25 +528,7 @@ class S3Storage(Storage):
     
     def _get_content_type(self, ext: str) -> str:
         """根据文件扩展名获取内容类型"""
-        content_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.bmp': 'image/bmp',
-            '.tiff': 'image/tiff',
-            '.tif': 'image/tiff',
-            '.md': 'text/markdown',
-            '.html': 'text/html',
-            '.txt': 'text/plain',
-            '.pdf': 'application/pdf',
-            '.json': 'application/json',
-            '.js': 'application/javascript',
-            '.css': 'text/css'
-        }
-        
-        return content_types.get(ext.lower(), 'application/octet-stream')
+        return _CONTENT_TYPES.get(ext.lower(), _DEFAULT_CONTENT_TYPE)
 
     def upload_fileobj(self, file_obj, remote_path: str, content_type: str = None, presign_url: bool = False, expires_in: int = 3600) -> Optional[str]:
         """
@@ -411,7 +547,7 @@ class S3Storage(Storage):
         抛出:
         - StorageError: 上传失败
         """
-        bucket_name = self.config['bucket_name']
+        bucket_name = self._bucket_name
         
         try:
             # 检查桶是否存在
@@ -419,7 +555,7 @@ class S3Storage(Storage):
                 return None
                 
             # 处理路径前缀
-            path_prefix = self.config.get('path_prefix', '').strip('/')
+            path_prefix = self._path_prefix
             if path_prefix and not remote_path.startswith(f"{path_prefix}/"):
                 remote_path = f"{path_prefix}/{remote_path}"
             
@@ -440,7 +576,8 @@ class S3Storage(Storage):
                 Fileobj=file_obj,
                 Bucket=bucket_name,
                 Key=remote_path,
-                ExtraArgs=extra_args
+                ExtraArgs=extra_args,
+                Config=self._transfer_config
             )
             
             logger.info(f"文件对象上传到 S3 成功，对象键: {remote_path}")
@@ -2,6 +2,6 @@
 配置模块，提供统一的配置管理
 """
 
-from .api_config import load_api_config, APIConfig
+from .api_config import load_api_config, reload_api_config, APIConfig
 
-__all__ = ['load_api_config', 'APIConfig'] 
\ No newline at end of file
+__all__ = ['load_api_config', 'reload_api_config', 'APIConfig'] 
\ No newline at end of file
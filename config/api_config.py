@@ -5,19 +5,24 @@ API 配置管理模块
 
 import os
 import logging
-from dataclasses import dataclass
+import hashlib
+import functools
+from dataclasses import dataclass, fields
 from typing import Optional, Generator
+from urllib.parse import quote, urlunsplit
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import DeclarativeBase, sessionmaker, scoped_session, Session
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# .env 文件是否已加载，避免重复解析
+_DOTENV_LOADED = False
+
+@dataclass(slots=True, frozen=True)
 class APIConfig:
-    """API 配置数据类"""
+    """API 配置数据类（不可变，加载后请勿修改）"""
     # Mistral 配置
     mistral_api_key: Optional[str] = None
     
@@ -39,6 +44,24 @@ class APIConfig:
     
     # 并行处理配置
     parallel_images: int = 3
+    parallel_files: int = 2
+    
+    # OCR 请求速率限制（每分钟请求数，0 表示不限制）
+    ocr_rate_limit: int = 60
+    
+    # 本地 PDF 上传到 OCR 服务而不内联为 base64 的最小文件大小（MB），0 表示总是上传，小于 0 表示不上传
+    ocr_upload_min_mb: int = 8
+    
+    # OCR 结果缓存配置
+    ocr_cache_dir: Optional[str] = None
+    ocr_cache_ttl_days: int = 30
+    
+    # 图片分析结果缓存配置
+    image_cache_dir: Optional[str] = None
+    image_cache_max_distance: int = 8
+    
+    # 已有图注的图片跳过多模态模型分析
+    skip_captioned_images: bool = False
     
     # 数据库配置
     db_user: Optional[str] = None
@@ -55,6 +78,7 @@ class APIConfig:
     redis_password: Optional[str] = None
     redis_ssl: bool = False
     redis_url: Optional[str] = None
+    redis_unix_socket_path: Optional[str] = None
     
     # Celery 配置
     celery_broker_url: Optional[str] = None
@@ -69,68 +93,231 @@ class APIConfig:
     celery_worker_concurrency: int = 4
 
 
+_TRUE_VALUES = frozenset(("1", "true", "yes"))
+
+
+def _parse_bool(value: str) -> bool:
+    """将环境变量字符串解析为布尔值"""
+    return value.lower() in _TRUE_VALUES
+
+
+# 环境变量定义: (配置属性, 环境变量名, 转换函数, 未设置时的默认值)
+_ENV_SCHEMA = (
+    # Mistral 配置
+    ("mistral_api_key", "MISTRAL_API_KEY", str, None),
+    
+    # OpenAI 配置
+    ("openai_api_key", "OPENAI_API_KEY", str, None),
+    ("openai_base_url", "OPENAI_BASE_URL", str, None),
+    ("openai_model_name", "MODEL_NAME", str, "gpt-4o"),
+    
+    # 百度千帆配置
+    ("qianfan_ak", "QIANFAN_AK", str, None),
+    ("qianfan_sk", "QIANFAN_SK", str, None),
+    
+    # S3/MinIO 配置
+    ("s3_access_key", "S3_ACCESS_KEY", str, None),
+    ("s3_secret_key", "S3_SECRET_KEY", str, None),
+    ("s3_bucket", "S3_BUCKET", str, None),
+    ("s3_endpoint_url", "S3_ENDPOINT_URL", str, None),
+    ("s3_path_prefix", "S3_PATH_PREFIX", str, ""),
+    
+    # 并行处理配置
+    ("parallel_images", "PARALLEL_IMAGES", int, 3),
+    ("parallel_files", "PARALLEL_FILES", int, 2),
+    
+    # OCR 请求速率限制
+    ("ocr_rate_limit", "MARKMUSE_OCR_RATE_LIMIT", int, 60),
+    ("ocr_upload_min_mb", "MARKMUSE_OCR_UPLOAD_MIN_MB", int, 8),
+    
+    # OCR 结果缓存配置
+    ("ocr_cache_dir", "MARKMUSE_OCR_CACHE_DIR", str, None),
+    ("ocr_cache_ttl_days", "MARKMUSE_OCR_CACHE_TTL_DAYS", int, 30),
+    
+    # 图片分析结果缓存配置
+    ("image_cache_dir", "MARKMUSE_IMAGE_CACHE_DIR", str, None),
+    ("image_cache_max_distance", "MARKMUSE_IMAGE_CACHE_MAX_DISTANCE", int, 8),
+    ("skip_captioned_images", "MARKMUSE_SKIP_CAPTIONED_IMAGES", _parse_bool, False),
+    
+    # 数据库配置
+    ("db_user", "DB_USER", str, None),
+    ("db_password", "DB_PASSWORD", str, None),
+    ("db_host", "DB_HOST", str, "localhost"),
+    ("db_port", "DB_PORT", str, "5432"),
+    ("db_name", "DB_NAME", str, None),
+    ("database_url", "DATABASE_URL", str, None),
+    
+    # Redis 配置
+    ("redis_host", "REDIS_HOST", str, "localhost"),
+    ("redis_port", "REDIS_PORT", int, 6379),
+    ("redis_db", "REDIS_DB", int, 0),
+    ("redis_password", "REDIS_PASSWORD", str, ""),
+    ("redis_ssl", "REDIS_SSL", _parse_bool, False),
+    ("redis_url", "REDIS_URL", str, None),
+    ("redis_unix_socket_path", "REDIS_UNIX_SOCKET_PATH", str, None),
+    
+    # Celery 配置
+    ("celery_broker_url", "CELERY_BROKER_URL", str, None),
+    ("celery_result_backend", "CELERY_RESULT_BACKEND", str, None),
+    ("celery_task_serializer", "CELERY_TASK_SERIALIZER", str, "json"),
+    ("celery_result_serializer", "CELERY_RESULT_SERIALIZER", str, "json"),
+    ("celery_accept_content", "CELERY_ACCEPT_CONTENT", str, "json"),
+    ("celery_timezone", "CELERY_TIMEZONE", str, "Asia/Shanghai"),
+    ("celery_enable_utc", "CELERY_ENABLE_UTC", _parse_bool, False),
+    ("celery_task_track_started", "CELERY_TASK_TRACK_STARTED", _parse_bool, False),
+    ("celery_task_time_limit", "CELERY_TASK_TIME_LIMIT", int, 3600),
+    ("celery_worker_concurrency", "CELERY_WORKER_CONCURRENCY", int, 4),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _build_redis_url(host: str, port: int, db: int, password: Optional[str], ssl: bool) -> str:
+    """
+    根据单独的配置构建 Redis 连接URL
+    
+    参数:
+    - host: 主机名
+    - port: 端口
+    - db: 数据库编号
+    - password: 密码（含 @、: 等字符时进行URL编码）
+    - ssl: 是否使用 SSL (rediss://)
+    
+    返回:
+    - str: Redis 连接URL
+    """
+    netloc = f":{quote(password, safe='')}@{host}:{port}" if password else f"{host}:{port}"
+    return urlunsplit(("rediss" if ssl else "redis", netloc, f"/{db}", "", ""))
+
+
+@functools.lru_cache(maxsize=1)
+def _build_db_url(cfg: APIConfig) -> Optional[str]:
+    """
+    根据单独的数据库配置构建 PostgreSQL 连接URL
+    
+    参数:
+    - cfg: API 配置对象
+    
+    返回:
+    - Optional[str]: 数据库连接URL，配置不完整时返回 None
+    """
+    if not (cfg.db_user and cfg.db_password and cfg.db_host and cfg.db_port and cfg.db_name):
+        return None
+    netloc = f"{quote(cfg.db_user, safe='')}:{quote(cfg.db_password, safe='')}@{cfg.db_host}:{cfg.db_port}"
+    return urlunsplit(("postgresql", netloc, f"/{cfg.db_name}", "", ""))
+
+
+def _load_dotenv_once() -> None:
+    """
+    加载 .env 文件，进程内只解析一次
+    
+    设置 MARKMUSE_SKIP_DOTENV=1 时跳过（如 Docker/systemd 已通过 env_file/EnvironmentFile 注入环境变量）
+    """
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        if os.environ.get("MARKMUSE_SKIP_DOTENV") != "1":
+            load_dotenv()
+        _DOTENV_LOADED = True
+
+
+def schema_checksum() -> str:
+    """
+    计算 APIConfig 字段定义的校验和，用于判断冻结的配置是否与当前定义一致
+    
+    返回:
+    - str: 字段名和类型的 SHA-256 摘要
+    """
+    spec = ";".join(f"{field.name}:{field.type}" for field in fields(APIConfig))
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+
+# 影响 Redis 连接URL的配置项，冻结配置被环境变量覆盖时需要重新构建URL
+_REDIS_URL_PARTS = frozenset(("redis_host", "redis_port", "redis_db", "redis_password", "redis_ssl"))
+
+
+def _load_frozen_config() -> Optional[APIConfig]:
+    """
+    加载由 python -m config.compile 生成的冻结配置（config/_frozen.py）
+    
+    运行时设置的环境变量优先于冻结的值（不读取 .env 文件）
+    
+    返回:
+    - Optional[APIConfig]: 冻结的配置对象，文件不存在或与当前字段定义不一致时返回 None
+    """
+    try:
+        from . import _frozen
+    except ImportError:
+        return None
+    
+    if getattr(_frozen, "SCHEMA_CHECKSUM", None) != schema_checksum():
+        logger.warning("冻结的配置与当前 APIConfig 定义不一致，将从环境变量重新加载。请重新运行 python -m config.compile")
+        return None
+    
+    values = dict(_frozen.FROZEN_VALUES)
+    env = os.environ
+    overridden = []
+    for attr, name, parse, _ in _ENV_SCHEMA:
+        value = env.get(name)
+        if value is not None:
+            values[attr] = parse(value)
+            overridden.append(name)
+    
+    # 单独的 Redis 配置被覆盖且未直接提供 REDIS_URL 时重新构建
+    if "REDIS_URL" not in env and _REDIS_URL_PARTS.intersection(
+        attr for attr, name, _, _ in _ENV_SCHEMA if name in overridden
+    ):
+        values["redis_url"] = _build_redis_url(
+            values["redis_host"], values["redis_port"], values["redis_db"],
+            values["redis_password"], values["redis_ssl"]
+        )
+    
+    logger.info(f"使用冻结配置 {_frozen.__file__}，删除该文件或重新运行 python -m config.compile 以更新")
+    if overridden:
+        logger.info(f"以下环境变量覆盖了冻结配置: {', '.join(overridden)}")
+    return APIConfig(**values)
+
+
+@functools.lru_cache(maxsize=1)
 def load_api_config() -> APIConfig:
     """
-    从环境变量加载 API 配置
+    加载 API 配置
+    
+    优先使用部署时生成的冻结配置，不存在时从环境变量加载。
+    结果会被缓存，重复调用返回同一个配置对象；需要重新读取环境变量时使用 reload_api_config
+    
+    返回:
+    - APIConfig: API 配置对象
+    """
+    config = _load_frozen_config()
+    if config is not None:
+        return config
+    return load_api_config_from_env()
+
+
+def load_api_config_from_env() -> APIConfig:
+    """
+    从 .env 文件和环境变量加载 API 配置（不使用冻结配置，不缓存）
     
     返回:
     - APIConfig: API 配置对象
     """
     # 加载 .env 文件
-    load_dotenv()
+    _load_dotenv_once()
     
-    # 创建配置对象
-    config = APIConfig(
-        # Mistral 配置
-        mistral_api_key=os.getenv("MISTRAL_API_KEY"),
-        
-        # OpenAI 配置
-        openai_api_key=os.getenv("OPENAI_API_KEY"),
-        openai_base_url=os.getenv("OPENAI_BASE_URL"),
-        openai_model_name=os.getenv("MODEL_NAME", "gpt-4o"),
-        
-        # 百度千帆配置
-        qianfan_ak=os.getenv("QIANFAN_AK"),
-        qianfan_sk=os.getenv("QIANFAN_SK"),
-        
-        # S3/MinIO 配置
-        s3_access_key=os.getenv("S3_ACCESS_KEY"),
-        s3_secret_key=os.getenv("S3_SECRET_KEY"),
-        s3_bucket=os.getenv("S3_BUCKET"),
-        s3_endpoint_url=os.getenv("S3_ENDPOINT_URL"),
-        s3_path_prefix=os.getenv("S3_PATH_PREFIX", ""),
-        
-        # 并行处理配置
-        parallel_images=int(os.getenv("PARALLEL_IMAGES", "3")),
-        
-        # 数据库配置
-        db_user=os.getenv("DB_USER"),
-        db_password=os.getenv("DB_PASSWORD"),
-        db_host=os.getenv("DB_HOST", "localhost"),
-        db_port=os.getenv("DB_PORT", "5432"),
-        db_name=os.getenv("DB_NAME"),
-        database_url=os.getenv("DATABASE_URL"),
-        
-        # Redis 配置
-        redis_host=os.getenv("REDIS_HOST", "localhost"),
-        redis_port=int(os.getenv("REDIS_PORT", "6379")),
-        redis_db=int(os.getenv("REDIS_DB", "0")),
-        redis_password=os.getenv("REDIS_PASSWORD", ""),
-        redis_ssl=os.getenv("REDIS_SSL", "").lower() == "true",
-        redis_url=os.getenv("REDIS_URL"),
-        
-        # Celery 配置
-        celery_broker_url=os.getenv("CELERY_BROKER_URL"),
-        celery_result_backend=os.getenv("CELERY_RESULT_BACKEND"),
-        celery_task_serializer=os.getenv("CELERY_TASK_SERIALIZER", "json"),
-        celery_result_serializer=os.getenv("CELERY_RESULT_SERIALIZER", "json"),
-        celery_accept_content=os.getenv("CELERY_ACCEPT_CONTENT", "json"),
-        celery_timezone=os.getenv("CELERY_TIMEZONE", "Asia/Shanghai"),
-        celery_enable_utc=os.getenv("CELERY_ENABLE_UTC", "").lower() == "true",
-        celery_task_track_started=os.getenv("CELERY_TASK_TRACK_STARTED", "").lower() == "true",
-        celery_task_time_limit=int(os.getenv("CELERY_TASK_TIME_LIMIT", "3600")),
-        celery_worker_concurrency=int(os.getenv("CELERY_WORKER_CONCURRENCY", "4"))
-    )
+    # 一次性复制环境变量，按字段定义逐项转换
+    env = dict(os.environ)
+    values = {
+        attr: default if (value := env.get(name)) is None else parse(value)
+        for attr, name, parse, default in _ENV_SCHEMA
+    }
+    
+    # 未直接提供 REDIS_URL 时从单独的配置构建
+    if not values["redis_url"]:
+        values["redis_url"] = _build_redis_url(
+            values["redis_host"], values["redis_port"], values["redis_db"],
+            values["redis_password"], values["redis_ssl"]
+        )
+    
+    config = APIConfig(**values)
     
     # 验证必要的配置
     if not config.mistral_api_key:
@@ -138,54 +325,136 @@ def load_api_config() -> APIConfig:
     
     return config 
 
+
+def reload_api_config() -> APIConfig:
+    """
+    清除缓存并重新加载 API 配置（重新解析 .env 文件和环境变量；使用冻结配置时只重新读取环境变量）
+    
+    注意: 模块级的 api_config 及据此构建的数据库/Redis配置不会随之更新
+    
+    返回:
+    - APIConfig: 新的 API 配置对象
+    """
+    global _DOTENV_LOADED
+    _DOTENV_LOADED = False
+    load_api_config.cache_clear()
+    return load_api_config()
+
+
 # 全局 API 配置实例
 api_config = load_api_config()
 
 # 数据库配置
 # 如果直接提供了 DATABASE_URL，则使用它；否则从单独的配置构建
-if api_config.database_url:
-    DATABASE_URL = api_config.database_url
-else:
-    # 如果没有提供 DATABASE_URL，尝试从各部分构建
-    if all([api_config.db_user, api_config.db_password, api_config.db_host, api_config.db_port, api_config.db_name]):
-        DATABASE_URL = f"postgresql://{api_config.db_user}:{api_config.db_password}@{api_config.db_host}:{api_config.db_port}/{api_config.db_name}"
-    else:
-        DATABASE_URL = None
-        logger.warning("数据库连接未完全配置，数据库功能将不可用。请配置 DATABASE_URL 或所有单独的数据库参数")
-
-# Redis配置
-# 如果直接提供了REDIS_URL，则使用它；否则从单独的配置构建
-if api_config.redis_url:
-    REDIS_URL = api_config.redis_url
-else:
-    # 构建Redis URL
-    password_part = f":{api_config.redis_password}@" if api_config.redis_password else ""
-    protocol = "rediss" if api_config.redis_ssl else "redis"
-    REDIS_URL = f"{protocol}://{password_part}{api_config.redis_host}:{api_config.redis_port}/{api_config.redis_db}"
-    # 更新配置中的URL
-    api_config.redis_url = REDIS_URL
-
-# 创建 SQLAlchemy 引擎和会话（如果DATABASE_URL可用）
-if DATABASE_URL:
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
-else:
-    engine = None
-    SessionLocal = None
-    Base = None
+DATABASE_URL = api_config.database_url or _build_db_url(api_config)
+if not DATABASE_URL:
+    logger.warning("数据库连接未完全配置，数据库功能将不可用。请配置 DATABASE_URL 或所有单独的数据库参数")
+
+# Redis配置（未提供REDIS_URL时已在 load_api_config 中根据单独的配置构建）
+REDIS_URL = api_config.redis_url
+
+# 连接池中连接的最长复用时间（秒）
+_POOL_RECYCLE_SECONDS = 1800
+
+# 声明式基类（SQLAlchemy 2.0 风格）
+class Base(DeclarativeBase):
+    """所有 ORM 模型的基类"""
+    pass
+
+
+@functools.lru_cache(maxsize=1)
+def _get_engine():
+    """
+    获取 SQLAlchemy 引擎，首次调用时才创建
+    
+    返回:
+    - Engine: 数据库引擎，DATABASE_URL 不可用时返回 None
+    """
+    if not DATABASE_URL:
+        return None
+    # SQLite 不使用 QueuePool，保持默认连接池
+    if DATABASE_URL.startswith("sqlite"):
+        return create_engine(DATABASE_URL)
+    # 连接池大小按 worker 并发数配置；取连接前预检，定期回收以避免数据库重启后的失效连接
+    concurrency = api_config.celery_worker_concurrency
+    return create_engine(
+        DATABASE_URL,
+        pool_size=concurrency * 2,
+        max_overflow=concurrency,
+        pool_pre_ping=True,
+        pool_recycle=_POOL_RECYCLE_SECONDS,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_sessionmaker():
+    """
+    获取会话工厂，首次调用时才创建
+    
+    返回:
+    - sessionmaker: 绑定到数据库引擎的会话工厂，DATABASE_URL 不可用时返回 None
+    """
+    bind = _get_engine()
+    if bind is None:
+        return None
+    return sessionmaker(autocommit=False, autoflush=False, bind=bind)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_scoped_session():
+    """
+    获取线程局部的会话注册表
+    
+    同一线程内多次调用返回同一个会话，调用 remove() 后关闭并丢弃；
+    适用于整个生命周期都在同一线程内的调用方（如 Celery 任务）
+    
+    返回:
+    - scoped_session: 会话注册表，DATABASE_URL 不可用时返回 None
+    """
+    session_factory = _get_sessionmaker()
+    if session_factory is None:
+        return None
+    return scoped_session(session_factory)
+
+
+def dispose_engine_after_fork() -> None:
+    """
+    在 fork 出的子进程中丢弃从父进程继承的连接池
+    
+    使用 close=False，不关闭父进程仍在使用的套接字；尚未创建引擎时不做任何操作
+    """
+    if _get_engine.cache_info().currsize:
+        engine = _get_engine()
+        if engine is not None:
+            engine.dispose(close=False)
+
+
+def __getattr__(name: str):
+    """按需创建模块级的 engine、SessionLocal 和 ScopedSession，兼容 from config.api_config import engine 等用法"""
+    if name == "engine":
+        return _get_engine()
+    if name == "SessionLocal":
+        return _get_sessionmaker()
+    if name == "ScopedSession":
+        return _get_scoped_session()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def get_db() -> Generator[Session, None, None]:
     """
     获取数据库会话的依赖函数
     
+    每个请求使用独立的会话：FastAPI 可能在不同的线程池线程中执行依赖的创建和清理，
+    线程局部的 ScopedSession.remove() 会作用到其他请求的会话上
+    
     返回:
     - Generator[Session, None, None]: 数据库会话生成器
     """
-    if SessionLocal is None:
+    session_factory = _get_sessionmaker()
+    if session_factory is None:
         raise RuntimeError("数据库配置不完整，无法建立连接")
         
-    db = SessionLocal()
+    db = session_factory()
     try:
         yield db
     finally:
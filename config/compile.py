@@ -0,0 +1,79 @@
+"""
+配置冻结工具
+将当前 .env 文件和环境变量解析后的配置写入 config/_frozen.py，
+运行时 load_api_config 直接导入该模块，跳过 .env 解析；运行时设置的环境变量仍优先于冻结的值
+
+用法: python -m config.compile [--output PATH]
+"""
+
+import os
+import sys
+import argparse
+import logging
+from dataclasses import asdict
+
+from .api_config import load_api_config_from_env, schema_checksum
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_frozen.py")
+
+
+def render_frozen_module() -> str:
+    """
+    生成冻结配置模块的源码
+    
+    返回:
+    - str: Python 源码
+    """
+    values = asdict(load_api_config_from_env())
+    lines = [
+        '"""',
+        "冻结的 API 配置（由 python -m config.compile 生成，请勿手动修改）",
+        "包含敏感信息，请勿提交到版本库",
+        '"""',
+        "",
+        f"SCHEMA_CHECKSUM = {schema_checksum()!r}",
+        "",
+        "FROZEN_VALUES = {",
+    ]
+    lines.extend(f"    {name!r}: {value!r}," for name, value in values.items())
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def write_frozen_module(output_path: str = DEFAULT_OUTPUT) -> str:
+    """
+    写入冻结配置模块（先写临时文件再替换，避免运行中的进程读到不完整的文件）
+    
+    参数:
+    - output_path: 输出文件路径
+    
+    返回:
+    - str: 输出文件路径
+    """
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_frozen_module())
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="将当前环境变量配置冻结为 Python 模块")
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help="输出文件路径（默认为 config/_frozen.py）"
+    )
+    args = parser.parse_args()
+    
+    output_path = write_frozen_module(args.output)
+    logger.info(f"已生成冻结配置: {output_path}")
+    print(f"已生成冻结配置: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
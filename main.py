@@ -11,6 +11,8 @@ import logging
 import threading
 import subprocess
 import signal
+import time
+import concurrent.futures
 
 # 配置日志
 logging.basicConfig(
@@ -19,6 +21,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 运行环境在进程生命周期内不变，模块加载时确定一次
+_IS_WINDOWS = platform.system() == "Windows"
+_PYTHON = sys.executable
+
 def parse_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='启动 FastAPI 应用和 Celery Worker')
@@ -103,50 +109,108 @@ def parse_args():
 
     return parser.parse_args()
 
-def run_api_server(args):
-    """启动API服务器"""
-    cmd = [sys.executable, "run_task_api.py"]
-    
-    if args.api_host != "0.0.0.0":
-        cmd.extend(["--host", args.api_host])
+def start_process(cmd):
+    """
+    在独立的进程组中启动子进程，以便将信号发送给整个进程树
     
-    if args.api_port != 8000:
-        cmd.extend(["--port", str(args.api_port)])
+    Windows 上使用 CREATE_NEW_PROCESS_GROUP，POSIX 上使用新会话
+    """
+    if _IS_WINDOWS:
+        return subprocess.Popen(cmd, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    return subprocess.Popen(cmd, start_new_session=True)
+
+def terminate_process(proc):
+    """向子进程所在的进程组发送终止信号"""
+    try:
+        if _IS_WINDOWS:
+            proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+    except (ProcessLookupError, OSError):
+        # 进程已退出
+        pass
+
+# 命令行参数表: (子进程参数, args 属性名, 默认值, 值转换函数)；
+# 属性值与默认值不同时追加参数，转换函数为 None 表示仅追加开关
+_API_FLAGS = (
+    ("--host", "api_host", "0.0.0.0", str),
+    ("--port", "api_port", 8000, str),
+    ("--reload", "api_reload", False, None),
+    ("--debug", "debug", False, None),
+)
+_WORKER_FLAGS = (
+    ("--concurrency", "worker_concurrency", 4, str),
+    ("--queues", "worker_queues", "default", str),
+    ("--events", "worker_events", False, None),
+)
+
+def _extend_flags(cmd, args, flags):
+    """按参数表将与默认值不同的参数追加到命令中"""
+    for flag, attr, default, conv in flags:
+        value = getattr(args, attr)
+        if value != default:
+            cmd.append(flag)
+            if conv is not None:
+                cmd.append(conv(value))
+    return cmd
+
+def wait_any(processes):
+    """
+    等待任一子进程退出
     
-    if args.api_reload:
-        cmd.append("--reload")
+    POSIX 上使用单个 os.waitpid(-1) 阻塞等待任意子进程，Windows 上轮询各进程状态
     
-    if args.debug:
-        cmd.append("--debug")
+    参数:
+    - processes: (名称, Popen) 列表
     
+    返回:
+    - 已退出进程的 (名称, Popen)
+    """
+    if not _IS_WINDOWS:
+        by_pid = {proc.pid: (name, proc) for name, proc in processes}
+        try:
+            while True:
+                pid, status = os.waitpid(-1, 0)
+                if pid in by_pid:
+                    name, proc = by_pid[pid]
+                    proc.returncode = os.waitstatus_to_exitcode(status)
+                    return name, proc
+        except ChildProcessError:
+            # 子进程已被回收，改为轮询
+            pass
+    while True:
+        for name, proc in processes:
+            if proc.poll() is not None:
+                return name, proc
+        time.sleep(0.2)
+
+def build_api_command(args):
+    """构建启动API服务器的命令"""
+    return _extend_flags([_PYTHON, "run_task_api.py"], args, _API_FLAGS)
+
+def run_api_server(args):
+    """启动API服务器"""
+    cmd = build_api_command(args)
     logger.info(f"启动 API 服务: {' '.join(cmd)}")
     
-    # 在Windows上，不使用shell=True可能会有问题
-    use_shell = platform.system() == "Windows"
-    return subprocess.Popen(cmd, shell=use_shell)
+    return start_process(cmd)
 
-def run_celery_worker(args):
-    """启动Celery Worker"""
-    cmd = [sys.executable, "run_celery_worker.py"]
-    
-    if args.worker_concurrency != 4:
-        cmd.extend(["--concurrency", str(args.worker_concurrency)])
+def build_worker_command(args):
+    """构建启动Celery Worker的命令"""
+    cmd = _extend_flags([_PYTHON, "run_celery_worker.py"], args, _WORKER_FLAGS)
     
+    # 全局调试模式会覆盖 Worker 的日志级别
     if args.worker_loglevel != "info" or args.debug:
-        loglevel = "debug" if args.debug else args.worker_loglevel
-        cmd.extend(["--loglevel", loglevel])
-    
-    if args.worker_queues != "default":
-        cmd.extend(["--queues", args.worker_queues])
-    
-    if args.worker_events:
-        cmd.append("--events")
+        cmd.extend(["--loglevel", "debug" if args.debug else args.worker_loglevel])
     
+    return cmd
+
+def run_celery_worker(args):
+    """启动Celery Worker"""
+    cmd = build_worker_command(args)
     logger.info(f"启动 Celery Worker: {' '.join(cmd)}")
     
-    # 在Windows上，不使用shell=True可能会有问题
-    use_shell = platform.system() == "Windows"
-    return subprocess.Popen(cmd, shell=use_shell)
+    return start_process(cmd)
 
 def main():
     """主入口函数"""
@@ -161,16 +225,40 @@ def main():
             handler.setLevel(logging.DEBUG)
         logger.info("全局调试模式已启用")
     
+    # 只启动一个服务时直接用该服务替换当前进程，无需保留父进程监管子进程
+    # （Windows 上的 exec 会另起新进程，仍使用子进程方式）
+    if args.run_api != args.run_worker and not _IS_WINDOWS:
+        if args.run_api:
+            cmd = build_api_command(args)
+            logger.info(f"启动 API 服务: {' '.join(cmd)}")
+        else:
+            cmd = build_worker_command(args)
+            logger.info(f"启动 Celery Worker: {' '.join(cmd)}")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execvp(cmd[0], cmd)
+    
     try:
-        # 启动API服务
+        # 并行启动所选服务，让各子进程的解释器同时初始化
+        launchers = []
         if args.run_api:
-            api_process = run_api_server(args)
-            processes.append(('API服务', api_process))
-        
-        # 启动Celery Worker
+            launchers.append(('API服务', run_api_server))
         if args.run_worker:
-            worker_process = run_celery_worker(args)
-            processes.append(('Celery Worker', worker_process))
+            launchers.append(('Celery Worker', run_celery_worker))
+        
+        if launchers:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(launchers)) as executor:
+                futures = {executor.submit(launcher, args): name for name, launcher in launchers}
+                errors = []
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        processes.append((futures[future], future.result()))
+                    except Exception as e:
+                        logger.error(f"启动 {futures[future]} 失败: {str(e)}")
+                        errors.append(e)
+            # 已启动的进程都已记录，出错时由 finally 统一终止
+            if errors:
+                raise errors[0]
         
         if not processes:
             logger.info("没有选择任何服务启动 (API 或 Worker)。请使用 --run-api 或 --run-worker 启动服务。")
@@ -185,17 +273,23 @@ def main():
             for name, proc in processes:
                 if proc.poll() is None:  # 如果进程还在运行
                     logger.info(f"正在终止 {name} 进程...")
-                    proc.terminate()
+                    terminate_process(proc)
             sys.exit(0)
         
         # 设置信号处理器
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
-        # 等待进程终止
-        for name, proc in processes:
-            proc.wait()
+        # 等待任一进程退出；有进程异常退出时立即终止其余服务
+        running = list(processes)
+        while running:
+            name, proc = wait_any(running)
+            running.remove((name, proc))
             logger.info(f"{name} 进程已终止，退出码: {proc.returncode}")
+            if proc.returncode != 0 and running:
+                logger.warning(f"{name} 进程异常退出，正在关闭其余服务...")
+                for _, other in running:
+                    terminate_process(other)
     
     except KeyboardInterrupt:
         logger.info("收到中断信号，正在关闭服务...")
@@ -204,7 +298,7 @@ def main():
         for name, proc in processes:
             if proc.poll() is None:  # 如果进程还在运行
                 logger.info(f"正在终止 {name} 进程...")
-                proc.terminate()
+                terminate_process(proc)
                 try:
                     proc.wait(timeout=5)
                 except subprocess.TimeoutExpired:
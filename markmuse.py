@@ -9,23 +9,46 @@ MarkMuse: 将 PDF 文件转换为 Markdown 文档，如同创作的缪斯，为
 import os
 import sys
 import argparse
-import base64
 import logging
-import requests
+import logging.handlers
+import queue
+import atexit
+import binascii
+import shutil
 from pathlib import Path
 from tqdm import tqdm
 import re
-from typing import Optional, Dict, Any, Union
+from typing import TYPE_CHECKING, Awaitable, Iterator, Optional, Dict, Any, Tuple, Union
 import time
+import struct
+import random
+import asyncio
+import threading
 import concurrent.futures
 
 # 导入自定义模块
 from config import load_api_config, APIConfig
-from clients.ocr import OCRClient
-from clients.llm import LLMClient
-from clients.storage import S3Storage, StorageError
-from clients.factory import create_clients, create_storage_client
-from clients.prompts import PromptManager
+from clients.ocr import (
+    OCRClient, OCRClientError, OCRCache, AdaptiveRateLimiter, OCRRateLimitError, OCRTransientError
+)
+from clients.llm import LLMClient, ImageAnalysisCache
+
+# 提示词、存储和客户端工厂模块依赖 LangChain、boto3、Celery 等较重的库，
+# 在实际使用时再导入，使 --help 和参数错误等提前退出的场景快速返回
+if TYPE_CHECKING:
+    from clients.prompts import PromptManager
+
+# pybase64 为可选依赖，使用 SIMD 加速 base64 编解码，未安装时回退到标准库
+try:
+    import pybase64 as b64codec
+    PYBASE64_SUPPORT = True
+except ImportError:
+    import base64 as b64codec
+    PYBASE64_SUPPORT = False
+
+# 图片 base64 解码函数；标准库的 base64.b64decode 会先把 str 编码为 bytes 再解码，
+# binascii.a2b_base64 直接接受 ASCII 字符串并忽略空白字符，少一次整段数据的复制
+_b64decode = b64codec.b64decode if PYBASE64_SUPPORT else binascii.a2b_base64
 
 # 导入S3存储模块
 try:
@@ -45,9 +68,219 @@ logging.basicConfig(
 )
 logger = logging.getLogger('markmuse')
 
+
+def _iter_pdf_files(folder: str) -> Iterator[str]:
+    """
+    使用 os.scandir 遍历目录中的PDF文件，跳过子目录、失效的符号链接和空文件
+    
+    参数:
+    - folder: 目录路径
+    
+    返回:
+    - PDF文件名迭代器
+    """
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name[-4:].lower() != '.pdf' or not entry.is_file():
+                continue
+            # 空文件必然转换失败，不提交给 OCR 服务以免浪费请求配额
+            if entry.stat().st_size == 0:
+                logger.warning(f"跳过空文件: {entry.name}")
+                continue
+            yield entry.name
+
+
+class _TqdmLoggingHandler(logging.StreamHandler):
+    """通过 tqdm.write 输出日志，避免日志打断进度条"""
+    
+    def emit(self, record):
+        try:
+            tqdm.write(self.format(record), file=self.stream)
+        except Exception:
+            self.handleError(record)
+
+
+# 命令行模式下的日志监听器
+_LOG_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+
+def _install_queue_logging() -> None:
+    """
+    将根日志器的处理器移到后台监听线程
+    
+    并发处理图片时各线程只把日志记录放入队列，由单个线程负责格式化和写入控制台及文件；
+    控制台输出改为经由 tqdm.write，保持进度条完整
+    """
+    global _LOG_LISTENER
+    root = logging.getLogger()
+    if not root.handlers or any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+    
+    handlers = []
+    for handler in root.handlers:
+        if type(handler) is logging.StreamHandler:
+            tqdm_handler = _TqdmLoggingHandler(handler.stream)
+            tqdm_handler.setFormatter(handler.formatter)
+            tqdm_handler.setLevel(handler.level)
+            handler = tqdm_handler
+        handlers.append(handler)
+    
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener.start()
+    atexit.register(listener.stop)
+    _LOG_LISTENER = listener
+
 # 加载 API 配置
 config = load_api_config()
 
+# OCR 模型名称
+OCR_MODEL = "mistral-ocr-latest"
+
+# OCR 请求触发速率限制后的最大重试次数和退避时间（秒）
+_OCR_MAX_RETRIES = 5
+# OCR 服务暂时不可用（超时、5xx）时的最大重试次数
+_OCR_TRANSIENT_RETRIES = 3
+_OCR_BACKOFF_BASE = 2.0
+_OCR_BACKOFF_MAX = 60.0
+
+# PDF 分块 base64 编码时每次读取的字节数，为 3 的倍数时各块编码结果可直接拼接
+_B64_CHUNK_SIZE = 3 * 1024 * 1024
+
+# 写入Markdown文件时的缓冲区大小
+_MD_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# 可识别的图片文件扩展名（小写）
+_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff')
+# data URI 头（"data:image/png;base64,"）的最大查找长度
+_DATA_URI_HEADER_MAX = 256
+# base64 数据中可能出现的空白字符，解码时会被忽略
+_B64_WHITESPACE = (' ', '\n', '\r', '\t')
+
+# 文件名中的不安全字符替换为下划线；固定字符集使用 str.translate，比正则替换更快
+_UNSAFE_FILENAME_TABLE = str.maketrans(dict.fromkeys("\\/*?:'\"<>|", "_"))
+
+# 逐图片、逐引用调用的正则表达式，在模块加载时编译
+_IMG_REF_RE = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+_MD_IMAGE_RE = re.compile(r'!\[.*?\]\(.*?\)')
+_MD_FORMAT_RE = re.compile(r'[#*_`~]')
+# 紧跟在图片引用之后的图注，例如 "Figure 3: ..."、"**图 2** ..."
+_CAPTION_RE = re.compile(r'\s*[*_]*\s*((?:Figure|Fig\.?|Table|Image|图|表)\s*\d+[^\n]*)', re.IGNORECASE)
+# 替代文本超过该长度时视为已有足够的图片说明
+_MIN_ALT_CAPTION_LENGTH = 20
+# 低于该像素数的图片（图标、分隔线等）不送入多模态模型分析
+_MIN_ANALYSIS_PIXELS = 100 * 100
+# JPEG 中携带图片尺寸的 SOF 标记（排除 DHT、JPG、DAC）
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Markdown 图片引用缺少扩展名时依次尝试的扩展名（按优先级）
+_LINK_EXT_PRIORITY = {'.png': 0, '.jpg': 1, '.jpeg': 2, '.gif': 3, '.webp': 4}
+
+
+# 后台事件循环 (进程ID, 事件循环)，按进程懒加载
+_BACKGROUND_LOOP = None
+_BACKGROUND_LOOP_LOCK = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取在守护线程中常驻运行的事件循环
+    
+    所有文档的图片分析共用同一个事件循环，异步 HTTP 客户端的连接池可以跨文档复用；
+    fork 出的子进程中不存在父进程的循环线程，按进程ID重新创建
+    """
+    global _BACKGROUND_LOOP
+    with _BACKGROUND_LOOP_LOCK:
+        if _BACKGROUND_LOOP is None or _BACKGROUND_LOOP[0] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="markmuse-event-loop", daemon=True).start()
+            _BACKGROUND_LOOP = (os.getpid(), loop)
+        return _BACKGROUND_LOOP[1]
+
+
+def _run_coroutine(coro):
+    """
+    同步执行协程
+    
+    协程提交到后台事件循环执行，调用线程阻塞等待结果，可在已有运行中事件循环的线程中调用
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result()
+
+
+def _probe_image(data: bytes) -> Optional[Tuple[str, Optional[int], Optional[int]]]:
+    """
+    根据文件头识别图片格式并读取尺寸，不解码像素数据
+    
+    参数:
+    - data: 图片字节数据
+    
+    返回:
+    - (格式, 宽, 高)，无法读取尺寸时宽高为 None；不是 PNG/JPEG/GIF/WebP 或尺寸字段被截断时返回 None
+    """
+    try:
+        if data.startswith(b'\x89PNG\r\n\x1a\n'):
+            width, height = struct.unpack('>II', data[16:24])
+            return 'png', width, height
+        if data.startswith((b'GIF87a', b'GIF89a')):
+            width, height = struct.unpack('<HH', data[6:10])
+            return 'gif', width, height
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            chunk = data[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', data[26:30])
+                return 'webp', width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                bits = int.from_bytes(data[21:25], 'little')
+                return 'webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b'VP8X':
+                return 'webp', int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+            return 'webp', None, None
+        if data.startswith(b'\xff\xd8'):
+            # 逐段扫描 JPEG 标记，直到找到帧头
+            pos = 2
+            while pos + 4 <= len(data):
+                if data[pos] != 0xFF:
+                    pos += 1
+                    continue
+                marker = data[pos + 1]
+                if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                    pos += 1 if marker == 0xFF else 2
+                    continue
+                if marker in _JPEG_SOF_MARKERS:
+                    height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+                    return 'jpeg', width, height
+                pos += 2 + struct.unpack('>H', data[pos + 2:pos + 4])[0]
+            return 'jpeg', None, None
+    except struct.error:
+        pass
+    return None
+
+
+def _write_file_atomic(path: str, data: bytes) -> None:
+    """
+    将数据写入文件
+    
+    先通过无缓冲的文件描述符写入同目录下的临时文件，再原子替换目标文件，
+    避免中断时留下不完整的图片
+    
+    参数:
+    - path: 目标文件路径
+    - data: 文件内容
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    os.close(fd)
+    os.replace(tmp_path, path)
+
 
 class MarkMuse:
     """PDF到Markdown转换器类"""
@@ -61,7 +294,12 @@ class MarkMuse:
         use_s3: bool = False, 
         s3_config: Dict[str, str] = None,
         parallel_images: int = 3,
-        prompt_manager: Optional[PromptManager] = None
+        prompt_manager: Optional['PromptManager'] = None,
+        ocr_cache: Optional[OCRCache] = None,
+        image_cache: Optional[ImageAnalysisCache] = None,
+        ocr_rate_limit: Optional[int] = None,
+        skip_captioned_images: Optional[bool] = None,
+        create_clients: bool = True
     ):
         """
         初始化转换器
@@ -75,6 +313,11 @@ class MarkMuse:
         - s3_config: S3配置参数
         - parallel_images: 并行处理图片的数量
         - prompt_manager: 提示词管理器，如果为 None 则创建默认管理器
+        - ocr_cache: OCR 结果缓存，如果为 None 且配置了 MARKMUSE_OCR_CACHE_DIR 则创建默认缓存
+        - image_cache: 图片分析结果缓存，如果为 None 且配置了 MARKMUSE_IMAGE_CACHE_DIR 则创建默认缓存
+        - ocr_rate_limit: 每分钟 OCR 请求数上限，为 None 时使用配置中的 MARKMUSE_OCR_RATE_LIMIT
+        - skip_captioned_images: 已有图注的图片是否跳过分析，为 None 时使用配置中的 MARKMUSE_SKIP_CAPTIONED_IMAGES
+        - create_clients: 未提供客户端时是否创建默认客户端；多进程批量转换的主进程不需要客户端，可设为 False
         """
         # 初始化 OCR 客户端
         self.ocr_client = ocr_client
@@ -85,23 +328,68 @@ class MarkMuse:
         # 其他参数初始化
         self.enhance_images = enhance_images
         self.parallel_images = parallel_images or config.parallel_images
+        self.skip_captioned_images = (
+            config.skip_captioned_images if skip_captioned_images is None else skip_captioned_images
+        )
         
         # 初始化提示词管理器
         self.prompt_manager = prompt_manager or self._create_default_prompt_manager()
         
-        # 如果未提供客户端，则尝试创建
-        if not self.ocr_client or (enhance_images and not self.llm_client):
-            clients = create_clients(config, llm_provider)
+        # 初始化 OCR 结果缓存
+        self.ocr_cache = ocr_cache
+        if self.ocr_cache is None and config.ocr_cache_dir:
+            try:
+                self.ocr_cache = OCRCache(config.ocr_cache_dir, config.ocr_cache_ttl_days)
+            except OSError as e:
+                logger.warning(f"创建OCR缓存目录失败: {str(e)}，将不使用缓存")
+        
+        # 初始化 OCR 请求限速器，批量转换时由多个线程共享
+        if ocr_rate_limit is None:
+            ocr_rate_limit = config.ocr_rate_limit
+        self.ocr_rate_limit = ocr_rate_limit
+        self.ocr_rate_limiter = AdaptiveRateLimiter(ocr_rate_limit) if ocr_rate_limit > 0 else None
+        
+        # 多进程批量转换时，子进程按相同参数重新创建转换器
+        self._worker_options = {
+            "enhance_images": enhance_images,
+            "llm_provider": llm_provider,
+            "use_s3": use_s3,
+            "s3_config": s3_config if isinstance(s3_config, dict) else None,
+            "parallel_images": self.parallel_images,
+            "skip_captioned_images": self.skip_captioned_images,
+        }
+        # 无法传给子进程的注入对象，子进程改用配置创建默认实例
+        self._worker_dropped = [
+            name for name, value in (
+                ("ocr_client", ocr_client),
+                ("llm_client", llm_client),
+                ("ocr_cache", ocr_cache),
+                ("image_cache", image_cache),
+                ("s3_config", None if isinstance(s3_config, dict) else s3_config),
+            ) if value is not None
+        ]
+        
+        # 初始化图片分析结果缓存
+        self.image_cache = image_cache
+        if self.image_cache is None and enhance_images and config.image_cache_dir:
+            try:
+                self.image_cache = ImageAnalysisCache(config.image_cache_dir, config.image_cache_max_distance)
+            except OSError as e:
+                logger.warning(f"创建图片分析缓存目录失败: {str(e)}，将不使用缓存")
+        
+        # 如果未提供客户端，则尝试创建；只创建转换需要的客户端，不启用图片增强时不创建 LLM 客户端
+        if create_clients and (not self.ocr_client or (enhance_images and not self.llm_client)):
+            from clients.factory import create_ocr_client, create_llm_client
             
             # 设置 OCR 客户端
             if not self.ocr_client:
-                self.ocr_client = clients["ocr_client"]
+                self.ocr_client = create_ocr_client(config)
                 if not self.ocr_client:
                     logger.error("无法创建 OCR 客户端，请检查配置")
             
             # 设置 LLM 客户端
             if not self.llm_client and enhance_images:
-                self.llm_client = clients["llm_client"]
+                self.llm_client = create_llm_client(config, llm_provider)
                 if not self.llm_client:
                     logger.warning("无法创建 LLM 客户端，图片增强功能将不可用")
                     self.enhance_images = False
@@ -122,9 +410,11 @@ class MarkMuse:
                 s3_config_to_use = s3_config or config
                 # 直接创建 S3Storage 实例，而不是通过工厂方法
                 if isinstance(s3_config_to_use, dict):
+                    from clients.storage import S3Storage
                     self.storage_client = S3Storage(s3_config_to_use)
                 else:
                     # 使用 factory 方法创建存储客户端
+                    from clients.factory import create_storage_client
                     self.storage_client = create_storage_client(s3_config_to_use)
                 
                 if self.storage_client:
@@ -136,8 +426,10 @@ class MarkMuse:
                 logger.error(f"初始化S3存储失败: {str(e)}")
                 self.use_s3 = False
     
-    def _create_default_prompt_manager(self) -> PromptManager:
+    def _create_default_prompt_manager(self) -> 'PromptManager':
         """创建默认提示词管理器"""
+        from clients.prompts import PromptManager
+        
         # 使用当前文件所在目录作为基准，创建 prompts 目录
         base_dir = Path(__file__).parent / "prompts"
         os.makedirs(base_dir, exist_ok=True)
@@ -147,7 +439,10 @@ class MarkMuse:
             os.makedirs(base_dir / template_type, exist_ok=True)
             
         logger.debug(f"创建默认提示词管理器，基础目录: {base_dir}")
-        return PromptManager(base_dir=base_dir, default_type="jinja2")
+        prompt_manager = PromptManager(base_dir=base_dir, default_type="jinja2")
+        # 提前编译图片分析模板，避免首张图片分析时承担编译开销
+        prompt_manager.precompile(["image_analysis"])
+        return prompt_manager
     
     def _get_image_analysis_prompt(self, img_id: str, page_idx: int, page_text: str = "") -> str:
         """
@@ -197,19 +492,49 @@ class MarkMuse:
                         "4. 整体语义理解\n"
                         "输出使用简洁明了的中文描述")
     
-    def encode_pdf(self, pdf_path: str) -> Optional[str]:
+    def encode_pdf(self, pdf_path: str, prefix: str = "") -> Optional[str]:
         """
         将PDF文件编码为base64字符串
         
+        文件按块读取并编码到预先分配的缓冲区，不在内存中同时保留整个文件和中间编码结果
+        
         参数:
         - pdf_path: PDF文件路径
+        - prefix: 添加在编码结果前的前缀，例如 data URI 头
         
         返回:
         - base64编码的字符串，如果失败则返回None
         """
         try:
             with open(pdf_path, "rb") as pdf_file:
-                return base64.b64encode(pdf_file.read()).decode('utf-8')
+                size = os.fstat(pdf_file.fileno()).st_size
+                header = prefix.encode('ascii')
+                buffer = bytearray(len(header) + (size + 2) // 3 * 4)
+                buffer[:len(header)] = header
+                view = memoryview(buffer)
+                chunk = bytearray(_B64_CHUNK_SIZE)
+                chunk_view = memoryview(chunk)
+                pos = len(header)
+                while True:
+                    # readinto 可能读不满，补读到块满或文件结束，保证只有最后一块的长度不是 3 的倍数
+                    n = 0
+                    while n < len(chunk) and (read := pdf_file.readinto(chunk_view[n:])):
+                        n += read
+                    if not n:
+                        break
+                    encoded = b64codec.b64encode(chunk_view[:n])
+                    end = pos + len(encoded)
+                    if end > len(buffer):
+                        raise ValueError("文件在读取期间变大，编码结果超出缓冲区")
+                    view[pos:end] = encoded
+                    pos = end
+                    if n < len(chunk):
+                        break
+                chunk_view.release()
+                view.release()
+                # 文件在读取期间被修改时按实际编码长度截断
+                del buffer[pos:]
+                return buffer.decode('ascii')
         except FileNotFoundError:
             logger.error(f"文件不存在: {pdf_path}")
             return None
@@ -221,6 +546,37 @@ class MarkMuse:
         """
         使用 OCR 客户端从 PDF 中提取文本
         
+        本地文件启用了 OCR 缓存时，按文件内容哈希查找缓存，命中则不再调用 OCR 服务
+        
+        参数:
+        - pdf_path_or_url: PDF 文件路径或URL
+        - is_url: 是否是URL
+        
+        返回:
+        - OCR响应对象，如果失败则返回None
+        """
+        cache_key = None
+        if self.ocr_cache and not is_url:
+            try:
+                content_hash = OCRCache.hash_file(pdf_path_or_url)
+            except OSError as e:
+                logger.debug(f"计算PDF哈希失败，跳过OCR缓存: {str(e)}")
+            else:
+                cache_key = OCRCache.make_key(content_hash, OCR_MODEL, True)
+                cached_response = self.ocr_cache.get(cache_key)
+                if cached_response is not None:
+                    logger.info(f"命中OCR缓存: {pdf_path_or_url}")
+                    return cached_response
+        
+        ocr_response = self._run_ocr(pdf_path_or_url, is_url)
+        if ocr_response is not None and cache_key:
+            self.ocr_cache.set(cache_key, ocr_response)
+        return ocr_response
+    
+    def _run_ocr(self, pdf_path_or_url: str, is_url: bool = False) -> Optional[Any]:
+        """
+        调用 OCR 服务处理 PDF
+        
         参数:
         - pdf_path_or_url: PDF 文件路径或URL
         - is_url: 是否是URL
@@ -262,14 +618,8 @@ class MarkMuse:
                     "document_url": pdf_url
                 }
                 
-                # 调用 OCR 客户端
-                ocr_response = self.ocr_client.process(
-                    model="mistral-ocr-latest",
-                    document=document,
-                    include_image_base64=True  # 仍需获取base64图像用于后处理
-                )
-                
-                return ocr_response
+                # 调用 OCR 客户端（仍需获取base64图像用于后处理）
+                return self._process_ocr_document(document)
                 
             # 以下是原有逻辑    
             if is_url:
@@ -280,30 +630,98 @@ class MarkMuse:
                     "document_url": pdf_path_or_url
                 }
             else:
-                # 本地文件，获取base64编码
                 logger.info(f"处理本地PDF: {pdf_path_or_url}")
-                base64_pdf = self.encode_pdf(pdf_path_or_url)
-                if not base64_pdf:
+                
+                # 达到上传阈值的文件优先上传到 OCR 服务后按引用处理，较小文件上传的额外请求不一定划算，默认仍内联为 base64
+                upload_min_mb = config.ocr_upload_min_mb
+                if upload_min_mb >= 0 and os.path.getsize(pdf_path_or_url) >= upload_min_mb * 1024 * 1024:
+                    ocr_response = self._process_uploaded_pdf(pdf_path_or_url)
+                    if ocr_response is not None:
+                        return ocr_response
+                
+                # 本地文件，获取base64编码
+                data_uri = self.encode_pdf(pdf_path_or_url, prefix="data:application/pdf;base64,")
+                if not data_uri:
                     return None
                 
                 document = {
                     "type": "document_url",
-                    "document_url": f"data:application/pdf;base64,{base64_pdf}"
+                    "document_url": data_uri
                 }
             
             # 调用 OCR 客户端
-            ocr_response = self.ocr_client.process(
-                model="mistral-ocr-latest",
-                document=document,
-                include_image_base64=True
-            )
-            
-            return ocr_response
+            return self._process_ocr_document(document)
             
         except Exception as e:
             logger.error(f"处理PDF时发生错误: {str(e)}")
             return None
     
+    def _process_uploaded_pdf(self, pdf_path: str) -> Optional[Any]:
+        """
+        将本地 PDF 上传到 OCR 服务后处理，处理完成后删除上传的文件
+        
+        参数:
+        - pdf_path: PDF文件路径
+        
+        返回:
+        - OCR响应对象，OCR 客户端不支持上传或上传失败时返回 None
+        """
+        try:
+            uploaded = self.ocr_client.upload_document(pdf_path)
+        except OCRClientError as e:
+            logger.warning(f"上传PDF失败，改用base64方式: {str(e)}")
+            return None
+        if uploaded is None:
+            return None
+        
+        file_id, document = uploaded
+        logger.info(f"PDF已上传到OCR服务: {file_id}")
+        try:
+            return self._process_ocr_document(document)
+        finally:
+            self.ocr_client.delete_document(file_id)
+    
+    def _process_ocr_document(self, document: Dict[str, Any]) -> Optional[Any]:
+        """
+        在速率限制内调用 OCR 客户端，触发速率限制或服务暂时不可用时按指数退避重试
+        
+        参数:
+        - document: 文档数据
+        
+        返回:
+        - OCR响应对象
+        
+        抛出:
+        - OCRRateLimitError: 重试次数用尽后仍触发速率限制
+        - OCRTransientError: 重试次数用尽后服务仍不可用
+        """
+        for attempt in range(_OCR_MAX_RETRIES + 1):
+            if self.ocr_rate_limiter:
+                self.ocr_rate_limiter.acquire()
+            try:
+                ocr_response = self.ocr_client.process(
+                    model=OCR_MODEL,
+                    document=document,
+                    include_image_base64=True
+                )
+            except (OCRRateLimitError, OCRTransientError) as e:
+                rate_limited = isinstance(e, OCRRateLimitError)
+                # 只有速率限制错误需要降低请求速率
+                if rate_limited and self.ocr_rate_limiter:
+                    self.ocr_rate_limiter.on_rate_limited()
+                if attempt >= (_OCR_MAX_RETRIES if rate_limited else _OCR_TRANSIENT_RETRIES):
+                    raise
+                # 指数退避并加入随机抖动，避免多个线程同时重试
+                delay = random.uniform(0, min(_OCR_BACKOFF_MAX, _OCR_BACKOFF_BASE * 2 ** attempt))
+                reason = "触发速率限制" if rate_limited else "暂时失败"
+                logger.warning(f"OCR请求{reason}，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+                time.sleep(delay)
+                continue
+            
+            if self.ocr_rate_limiter:
+                self.ocr_rate_limiter.on_success()
+            return ocr_response
+    
     def save_images_from_ocr(self, ocr_response: Any, images_dir: str) -> Dict[str, Union[str, Dict]]:
         """
         从OCR结果中提取并保存图片并支持并行处理
@@ -315,17 +733,21 @@ class MarkMuse:
         返回:
         - Dict[str, Union[str, Dict]]: 图片ID到本地保存路径或S3 URL的映射
         """
-        # 确保图片目录存在 (即使使用S3也创建本地目录，以应对S3上传失败的情况)
-        os.makedirs(images_dir, exist_ok=True)
+        # 本地存储时确保图片目录存在；使用S3时只在上传失败回退到本地保存时才创建
+        if not (self.use_s3 and self.storage_client):
+            os.makedirs(images_dir, exist_ok=True)
         
         # 用于存储图片ID到路径的映射
         image_map = {}
         
-        # 计算总图片数量
-        total_images = 0
-        for page in ocr_response.pages:
-            if hasattr(page, 'images') and page.images:
-                total_images += len(page.images)
+        # 遍历一次页面，收集所有图片任务
+        pages = ocr_response.pages
+        image_tasks = [
+            (page_idx, img_idx, img)
+            for page_idx, page in enumerate(pages)
+            for img_idx, img in enumerate(getattr(page, 'images', None) or ())
+        ]
+        total_images = len(image_tasks)
         
         if total_images == 0:
             logger.info("未在文档中找到图片")
@@ -337,170 +759,120 @@ class MarkMuse:
         else:
             logger.info(f"使用本地存储处理 {total_images} 张图片")
         
-        # 存储页面对象，以便在图片处理时获取页面文本
-        self._current_pages = ocr_response.pages
-        
         # 创建进度条
-        with tqdm(total=total_images, desc="处理图片", unit="张") as pbar:
-            # 收集所有图片任务
-            image_tasks = []
-            for page_idx, page in enumerate(ocr_response.pages):
-                # 检查页面是否有图片
-                if hasattr(page, 'images') and page.images:
-                    # 处理页面中的每一张图片
-                    for img_idx, img in enumerate(page.images):
-                        image_tasks.append((page_idx, img_idx, img))
-            
-            # 使用线程池进行并行处理
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel_images) as executor:
-                futures = {
-                    executor.submit(self._process_single_image, task, images_dir): task 
-                    for task in image_tasks
-                }
-                
-                for future in concurrent.futures.as_completed(futures):
-                    result = future.result()
-                    if result:
-                        img_id, img_data = result
-                        image_map[img_id] = img_data
-                        # 如果原始ID不包含文件扩展名，也添加带扩展名版本到映射
-                        if not re.search(r'\.(jpg|jpeg|png|gif|webp|bmp|tiff)$', img_id, re.IGNORECASE):
-                            image_map[img_id + '.png'] = img_data
-                    pbar.update(1)
-        
-        # 清理暂存的页面对象
-        self._current_pages = None
+        s3_count = 0
+        local_count = 0
+        # 图片较多时降低进度条刷新频率，避免每张图片都重绘
+        with tqdm(
+            total=total_images, desc="处理图片", unit="张",
+            mininterval=0.5, miniters=max(1, total_images // 100)
+        ) as pbar:
+            # 在事件循环中并发处理图片，多模态模型调用不再各占一个线程
+            for result in _run_coroutine(self._process_images_async(image_tasks, pages, images_dir, pbar)):
+                if result:
+                    img_id, img_data = result
+                    image_map[img_id] = img_data
+                    # 如果原始ID不包含文件扩展名，也添加带扩展名版本到映射
+                    if not img_id.lower().endswith(_IMAGE_EXTS):
+                        image_map[img_id + '.png'] = img_data
+                    # 统计结果存储位置
+                    if img_data.get("is_s3", False):
+                        s3_count += 1
+                    else:
+                        local_count += 1
         
         # 日志明确区分结果存储位置
-        s3_count = sum(1 for v in image_map.values() if isinstance(v, dict) and v.get("is_s3", False))
-        local_count = len(image_map) - s3_count
-        
         if s3_count > 0:
             logger.info(f"共提取并上传到S3 {s3_count} 张图片")
         if local_count > 0:
             logger.info(f"共提取并保存到本地 {local_count} 张图片")
-            
+        
         return image_map
     
-    def _process_single_image(self, task_data, images_dir):
+    @staticmethod
+    def _find_captioned_images(pages) -> set:
+        """
+        查找 Markdown 中已有图注或详细替代文本的图片
+        
+        参数:
+        - pages: OCR 结果的页面列表
+        
+        返回:
+        - set: 图片ID集合
+        """
+        captioned = set()
+        for page in pages:
+            markdown = getattr(page, 'markdown', None)
+            if not markdown:
+                continue
+            for match in _IMG_REF_RE.finditer(markdown):
+                alt_text, img_url = match.group(1, 2)
+                img_id = img_url.rpartition('/')[2]
+                # OCR 生成的替代文本通常就是图片ID，不算作说明
+                has_alt = len(alt_text.strip()) > _MIN_ALT_CAPTION_LENGTH and alt_text != img_id
+                if has_alt or _CAPTION_RE.match(markdown, match.end()):
+                    captioned.add(img_id)
+        return captioned
+    
+    async def _process_images_async(self, image_tasks: list, pages: list, images_dir: str, pbar: Any) -> list:
+        """
+        在事件循环中并发处理所有图片
+        
+        参数:
+        - image_tasks: (页码, 图片序号, 图片对象) 任务列表
+        - pages: OCR 结果的页面列表，用于获取图片所在页面的文本
+        - images_dir: 图片保存目录
+        - pbar: 进度条，每完成一张图片更新一次
+        
+        返回:
+        - list: 每张图片的处理结果，顺序与 image_tasks 一致
+        """
+        semaphore = asyncio.Semaphore(self.parallel_images)
+        captioned = (
+            self._find_captioned_images(pages) if self.enhance_images and self.skip_captioned_images else set()
+        )
+        # 按任务序号写入预分配的结果列表，结果顺序与文档中的图片顺序一致，不受完成先后影响
+        results = [None] * len(image_tasks)
+        
+        async def run(idx, task):
+            results[idx] = await self._process_single_image(task, pages, images_dir, semaphore, captioned)
+            pbar.update(1)
+        
+        await asyncio.gather(*(run(idx, task) for idx, task in enumerate(image_tasks)))
+        return results
+    
+    async def _process_single_image(
+        self,
+        task_data: Tuple[int, int, Any],
+        pages: list,
+        images_dir: str,
+        semaphore: asyncio.Semaphore,
+        captioned: Union[set, frozenset] = frozenset()
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
         """处理单张图片并返回结果"""
         page_idx, img_idx, img = task_data
         try:
-            # 获取图片ID和base64数据
-            img_id = getattr(img, 'id', f"img-p{page_idx+1}-{img_idx+1}.png")
-            
-            # 安全处理文件名（避免特殊字符）
-            safe_filename = re.sub(r"[\\/*?:'\"<>|]", "_", img_id)
-            
-            # 确保文件名有正确的扩展名
-            if not re.search(r'\.(jpg|jpeg|png|gif|webp|bmp|tiff)$', safe_filename, re.IGNORECASE):
-                safe_filename += '.png'
-            
-            # 获取base64图像数据
-            image_base64_data = getattr(img, 'image_base64', None)
-            
-            if not image_base64_data:
-                return None
-            
-            # 检查是否包含data URI前缀
-            if ',' in image_base64_data and ';base64,' in image_base64_data:
-                content_type = image_base64_data.split(';')[0].split(':')[1]
-                image_base64_data = image_base64_data.split(',', 1)[1]
-            else:
-                content_type = "image/png"  # 默认内容类型
-            
-            try:
-                # 清理base64字符串（删除可能的换行符和空白字符）
-                cleaned_base64 = ''.join(image_base64_data.split())
-                # 解码base64数据
-                img_data = base64.b64decode(cleaned_base64)
-            except Exception:
-                # 尝试填充base64字符串
-                try:
-                    # 添加缺失的填充字符
-                    padding_needed = len(cleaned_base64) % 4
-                    if padding_needed:
-                        cleaned_base64 += '=' * (4 - padding_needed)
-                    img_data = base64.b64decode(cleaned_base64)
-                except Exception:
+            async with semaphore:
+                # 解码和存储为阻塞操作，放到线程中执行
+                decoded = await asyncio.to_thread(self._decode_single_image, page_idx, img_idx, img)
+                if not decoded:
                     return None
-            
-            # 检查解码后的数据大小，确保不为空
-            if len(img_data) < 100:  # 通常任何有效图像都应该>100字节
-                return None
+                img_id, safe_filename, content_type, img_data = decoded
                 
-            img_url = None
-            img_path = None
-            
-            # S3存储路径与URL处理
-            if self.use_s3 and self.storage_client:
-                # 构建S3存储路径
-                parent_dir = Path(images_dir).name  # 获取父目录名
-                s3_key = f"{parent_dir}/{safe_filename}"
-                
-                # 直接上传图片数据到S3
-                img_url = self.storage_client.upload_bytes(
-                    data=img_data,
-                    remote_path=s3_key,
-                    content_type=content_type
-                )
+                # 上传S3或保存到本地与图片分析并发进行，只有使用URL分析时才需要等待上传完成
+                persisted = asyncio.ensure_future(asyncio.to_thread(
+                    self._persist_image, img_id, safe_filename, content_type, img_data, images_dir
+                ))
                 
-                if img_url:
-                    logger.debug(f"图片 {img_id} 已直接上传到S3，URL: {img_url}")
-                else:
-                    logger.warning(f"图片 {img_id} 上传S3失败，将尝试保存到本地")
-            
-            # 如果S3上传失败或没有启用S3，则保存到本地
-            if not img_url:
-                # 创建保存路径
-                img_path = os.path.join(images_dir, safe_filename)
-                
-                # 保存图片
-                with open(img_path, 'wb') as f:
-                    f.write(img_data)
-            
-            # 分析图片内容（如果启用增强）
-            description = ""
-            if self.enhance_images and self.llm_client:
-                try:
-                    # 获取页面文本内容（如果可用）
-                    page_text = ""
-                    if hasattr(self, '_current_pages') and self._current_pages and page_idx < len(self._current_pages):
-                        page = self._current_pages[page_idx]
-                        # 优先获取页面文本，如果没有则尝试从markdown中提取
-                        if hasattr(page, 'text'):
-                            page_text = page.text
-                        elif hasattr(page, 'markdown'):
-                            # 从markdown中移除图片链接和格式
-                            markdown_text = page.markdown
-                            # 移除图片链接
-                            markdown_text = re.sub(r'!\[.*?\]\(.*?\)', '', markdown_text)
-                            # 移除标题、加粗等格式
-                            markdown_text = re.sub(r'[#*_`~]', '', markdown_text)
-                            page_text = markdown_text
-                    
-                    # 获取图片分析提示词
-                    analysis_prompt = self._get_image_analysis_prompt(img_id, page_idx, page_text)
-                    
-                    # 优先使用 URL 分析，如果支持
-                    if img_url and hasattr(self.llm_client, 'analyze_image_url'):
-                        description = self.llm_client.analyze_image_url(
-                            img_url, 
-                            analysis_prompt=analysis_prompt
-                        )
-                        logger.debug(f"使用URL分析图片 {img_id}")
-                    else:
-                        # 回退到流式输出分析图片
-                        description = self.llm_client.analyze_image_streaming(
-                            cleaned_base64, 
-                            img_id,
-                            analysis_prompt=analysis_prompt
-                        )
-                        logger.debug(f"使用Base64分析图片 {img_id}")
-                    
-                    logger.debug(f"图片 {img_id} 分析结果: {description}")
-                except Exception as e:
-                    logger.error(f"分析图片 {img_id} 时出错: {str(e)}")
+                # 分析图片内容（如果启用增强），跳过无法识别或过小的图片
+                description = ""
+                if img_id in captioned:
+                    logger.debug(f"图片 {img_id} 已有图注，跳过分析")
+                elif self.enhance_images and self.llm_client and self._should_analyze_image(img_id, img_data):
+                    description = await self._analyze_single_image(
+                        img_id, page_idx, pages, img_data, persisted
+                    )
+                img_url, img_path = await persisted
             
             # 添加到映射
             if description:
@@ -520,11 +892,234 @@ class MarkMuse:
                     return img_id, {"path": img_url, "is_s3": True}
                 else:  # 本地模式
                     return img_id, {"path": img_path}
-            
+        
         except Exception as e:
             logger.debug(f"处理图片时出错: {str(e)}")
             return None
     
+    @staticmethod
+    def _should_analyze_image(img_id: str, img_data: bytes) -> bool:
+        """
+        判断图片是否值得送入多模态模型分析
+        
+        参数:
+        - img_id: 图片ID
+        - img_data: 图片字节数据
+        
+        返回:
+        - bool: 格式可识别且尺寸不小于阈值时返回 True
+        """
+        probe = _probe_image(img_data)
+        if probe is None:
+            logger.debug(f"图片 {img_id} 格式无法识别，跳过分析")
+            return False
+        
+        _, width, height = probe
+        if width is not None and height is not None and width * height < _MIN_ANALYSIS_PIXELS:
+            logger.debug(f"图片 {img_id} 尺寸过小 ({width}x{height})，跳过分析")
+            return False
+        return True
+    
+    def _decode_single_image(
+        self, page_idx: int, img_idx: int, img: Any
+    ) -> Optional[Tuple[str, str, str, bytes]]:
+        """解码单张图片，返回 (图片ID, 安全文件名, 内容类型, 图片数据)，无有效图片数据时返回 None"""
+        # 获取图片ID和base64数据
+        img_id = getattr(img, 'id', f"img-p{page_idx+1}-{img_idx+1}.png")
+        
+        # 安全处理文件名（避免特殊字符）
+        safe_filename = img_id.translate(_UNSAFE_FILENAME_TABLE)
+        
+        # 确保文件名有正确的扩展名
+        if not safe_filename.lower().endswith(_IMAGE_EXTS):
+            safe_filename += '.png'
+        
+        # 获取base64图像数据
+        image_base64_data = getattr(img, 'image_base64', None)
+        
+        if not image_base64_data:
+            return None
+        
+        # 检查是否包含data URI前缀；前缀只会出现在开头，只在开头的少量字符中查找，不扫描整段base64数据
+        marker = image_base64_data.find(';base64,', 0, _DATA_URI_HEADER_MAX) if image_base64_data.startswith('data:') else -1
+        if marker >= 0:
+            content_type = image_base64_data[5:marker].partition(';')[0]
+            image_base64_data = image_base64_data[marker + 8:]
+        else:
+            content_type = "image/png"  # 默认内容类型
+        
+        try:
+            # 解码base64数据（非 base64 字符如换行符会被忽略）
+            img_data = _b64decode(image_base64_data)
+        except ValueError:
+            # 缺少填充字符时补齐后重试；解码器会忽略空白字符，只按有效字符数计算填充，避免复制整段数据去除空白
+            significant = len(image_base64_data) - sum(map(image_base64_data.count, _B64_WHITESPACE))
+            try:
+                img_data = _b64decode(image_base64_data + '=' * (-significant % 4))
+            except ValueError:
+                return None
+        
+        # 检查解码后的数据大小，确保不为空
+        if len(img_data) < 100:  # 通常任何有效图像都应该>100字节
+            return None
+        
+        # 只保留解码后的图片数据，base64字符串在需要时再由图片数据重新编码
+        return img_id, safe_filename, content_type, img_data
+    
+    def _persist_image(
+        self, img_id: str, safe_filename: str, content_type: str, img_data: bytes, images_dir: str
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """上传图片到S3或保存到本地，返回 (URL, 本地路径)"""
+        img_url = None
+        img_path = None
+        
+        # S3存储路径与URL处理
+        if self.use_s3 and self.storage_client:
+            # 构建S3存储路径
+            parent_dir = os.path.basename(images_dir.rstrip('/' + os.sep))  # 获取父目录名
+            s3_key = f"{parent_dir}/{safe_filename}"
+            
+            # 直接上传图片数据到S3
+            img_url = self.storage_client.upload_bytes(
+                data=img_data,
+                remote_path=s3_key,
+                content_type=content_type
+            )
+            
+            if img_url:
+                logger.debug(f"图片 {img_id} 已直接上传到S3，URL: {img_url}")
+            else:
+                logger.warning(f"图片 {img_id} 上传S3失败，将尝试保存到本地")
+                os.makedirs(images_dir, exist_ok=True)
+        
+        # 如果S3上传失败或没有启用S3，则保存到本地
+        if not img_url:
+            # 创建保存路径
+            img_path = f"{images_dir}{os.sep}{safe_filename}"
+            
+            # 保存图片
+            _write_file_atomic(img_path, img_data)
+        
+        return img_url, img_path
+    
+    async def _analyze_single_image(
+        self, img_id: str, page_idx: int, pages: list, img_data: bytes, persisted: Awaitable
+    ) -> str:
+        """
+        使用多模态模型异步分析单张图片，返回图片描述
+        
+        persisted 为正在进行的上传或保存任务，结果为 (URL, 本地路径)；只有在使用URL分析时才等待其完成
+        """
+        description = ""
+        try:
+            # 获取页面文本内容（如果可用）
+            page_text = ""
+            if pages and page_idx < len(pages):
+                page = pages[page_idx]
+                # 优先获取页面文本，如果没有则尝试从markdown中提取
+                if hasattr(page, 'text'):
+                    page_text = page.text
+                elif hasattr(page, 'markdown'):
+                    # 从markdown中移除图片链接和格式
+                    markdown_text = page.markdown
+                    # 移除图片链接
+                    markdown_text = _MD_IMAGE_RE.sub('', markdown_text)
+                    # 移除标题、加粗等格式
+                    markdown_text = _MD_FORMAT_RE.sub('', markdown_text)
+                    page_text = markdown_text
+            
+            # 获取图片分析提示词
+            analysis_prompt = self._get_image_analysis_prompt(img_id, page_idx, page_text)
+            
+            # 查找相同或近似图片的已有分析结果
+            cached_description, cache_hashes = None, None
+            model_name = getattr(self.llm_client, 'model_name', '') or ''
+            if self.image_cache:
+                cached_description, cache_hashes = await asyncio.to_thread(
+                    self.image_cache.lookup, img_data, model_name, analysis_prompt
+                )
+            
+            # 启用S3且模型支持URL分析时，需要等待上传完成以获得图片URL
+            img_url = None
+            if (not cached_description and self.use_s3 and self.storage_client
+                    and hasattr(self.llm_client, 'aanalyze_image_url')):
+                img_url, _ = await persisted
+            
+            if cached_description:
+                description = cached_description
+                logger.debug(f"图片 {img_id} 命中分析缓存")
+            # 优先使用 URL 分析，如果支持
+            elif img_url:
+                description = await self.llm_client.aanalyze_image_url(
+                    img_url, 
+                    analysis_prompt=analysis_prompt
+                )
+                logger.debug(f"使用URL分析图片 {img_id}")
+            else:
+                # 回退到流式输出分析图片
+                description = await self.llm_client.aanalyze_image_streaming(
+                    b64codec.b64encode(img_data).decode('ascii'), 
+                    img_id,
+                    analysis_prompt=analysis_prompt
+                )
+                logger.debug(f"使用Base64分析图片 {img_id}")
+            
+            if cache_hashes and description and not cached_description:
+                await asyncio.to_thread(self.image_cache.store, cache_hashes, model_name, description)
+            
+            logger.debug(f"图片 {img_id} 分析结果: {description}")
+        except Exception as e:
+            logger.error(f"分析图片 {img_id} 时出错: {str(e)}")
+        return description
+    
+    @staticmethod
+    def _build_image_index(image_map: Dict[str, Union[str, Dict]], output_dir: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        构建图片引用索引，使每个 Markdown 图片引用只需一次字典查找
+        
+        除图片ID本身外，还为去掉扩展名的ID建立索引，以匹配不带扩展名的引用；
+        本地图片的相对路径在建立索引时计算，同一目录只调用一次 os.path.relpath
+        
+        参数:
+        - image_map: save_images_from_ocr 返回的图片映射
+        - output_dir: Markdown 输出目录
+        
+        返回:
+        - Dict[str, Tuple[str, Optional[str]]]: 图片ID到 (引用路径或URL, 图片描述) 的映射
+        """
+        index = {}
+        stems = {}
+        # 图片目录到其相对路径的缓存，图片通常都保存在同一个目录中
+        rel_dirs = {}
+        for img_id, img_info in image_map.items():
+            if isinstance(img_info, dict):
+                path_or_url = img_info["path"]
+                is_s3 = img_info.get("is_s3", False)
+                description = img_info.get("description")
+            else:
+                path_or_url, is_s3, description = img_info, False, None
+            if not path_or_url:
+                continue
+            
+            # S3路径直接使用URL，本地路径转换为相对路径（使用正斜杠以兼容Markdown）
+            if not is_s3:
+                img_dir, img_name = os.path.split(path_or_url)
+                rel_dir = rel_dirs.get(img_dir)
+                if rel_dir is None:
+                    rel_dir = rel_dirs[img_dir] = os.path.relpath(img_dir or os.curdir, output_dir).replace(os.sep, '/')
+                path_or_url = img_name if rel_dir == '.' else f"{rel_dir}/{img_name}"
+            entry = (path_or_url, description)
+            index[img_id] = entry
+            
+            stem, ext = os.path.splitext(img_id)
+            rank = _LINK_EXT_PRIORITY.get(ext)
+            if rank is not None and (stem not in stems or rank < stems[stem][0]):
+                stems[stem] = (rank, entry)
+        
+        for stem, (_, entry) in stems.items():
+            index.setdefault(stem, entry)
+        return index
+    
     def create_markdown_from_ocr(self, ocr_response: Any, output_dir: str, filename: str) -> str:
         """
         从OCR结果创建Markdown文件
@@ -542,133 +1137,51 @@ class MarkMuse:
             logger.error("OCR响应中未找到'pages'属性")
             return ""
         
-        # 确保输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
+        # 输出Markdown文件的路径
+        output_file = os.path.join(output_dir, f"{filename}.md")
         
-        # 创建图片目录
+        # 确保输出文件所在目录存在 (filename 可能包含子目录，使用S3时不会创建本地图片目录)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        
+        # 图片目录由 save_images_from_ocr 在需要时创建
         images_dir = os.path.join(output_dir, f"{filename}_images")
-        os.makedirs(images_dir, exist_ok=True)
         
         # 保存图片并获取图片ID到路径的映射
         image_map = self.save_images_from_ocr(ocr_response, images_dir)
+        image_index = self._build_image_index(image_map, output_dir)
         
-        # 输出Markdown文件的路径
-        output_file = os.path.join(output_dir, f"{filename}.md")
-        
-        # 合并所有页面的Markdown内容
-        all_content = []
-        
-        # 创建页面处理进度条
-        with tqdm(total=len(ocr_response.pages), desc="处理页面", unit="页") as pbar:
-            for page in ocr_response.pages:
-                if hasattr(page, 'markdown'):
-                    # 提取页面的Markdown内容
-                    page_content = page.markdown
-                    
-                    # 增强模式：替换图片链接并添加描述
-                    if self.enhance_images:
-                        # 查找该页面中的所有图片引用
-                        img_refs = re.findall(r'!\[([^\]]*)\]\(([^)]+)\)', page_content)
-                        for alt_text, img_url in img_refs:
-                            # 从URL中获取图片ID
-                            if '/' in img_url:
-                                img_id = img_url.split('/')[-1]
-                            else:
-                                img_id = img_url
-                                
-                            # 查找图片映射
-                            img_info = None
-                            if img_id in image_map:
-                                img_info = image_map[img_id]
-                            # 尝试添加常见图片扩展名
-                            elif not re.search(r'\.(jpg|jpeg|png|gif|webp)$', img_id, re.IGNORECASE):
-                                for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']:
-                                    if img_id + ext in image_map:
-                                        img_info = image_map[img_id + ext]
-                                        break
-                            
-                            if img_info and isinstance(img_info, dict) and "description" in img_info:
-                                # 获取图片路径或URL
-                                img_path_or_url = img_info["path"]
-                                
-                                # 检查是否是S3路径（使用标记）
-                                is_s3 = img_info.get("is_s3", False)
-                                
-                                # 如果不是S3路径，需要计算相对路径
-                                if not is_s3:
-                                    img_path_or_url = os.path.relpath(img_path_or_url, output_dir)
-                                    img_path_or_url = img_path_or_url.replace(os.sep, '/')
-                                
-                                # 构建新的Markdown图片引用，带上分析结果
-                                description = img_info["description"]
-                                new_img_ref = f"![{alt_text}]({img_path_or_url})\n\n**AI图片分析**：{description}\n"
-                                
-                                # 替换原始引用
-                                original_ref = f"![{alt_text}]({img_url})"
-                                page_content = page_content.replace(original_ref, new_img_ref)
-                    
-                    all_content.append(page_content)
-                pbar.update(1)
-        
-        # 合并所有内容
-        markdown_content = "\n\n".join(all_content)
+        enhance_images = self.enhance_images
         
         def replace_image_link(match):
-            """替换图片链接，使其指向本地保存的图片或S3路径"""
-            alt_text = match.group(1)
-            original_url = match.group(2)
+            """替换图片链接，使其指向本地保存的图片或S3路径，增强模式下附加图片分析结果"""
+            alt_text, original_url = match.group(1, 2)
             
             # 从完整的URL中提取图片ID（通常是最后的文件名部分）
-            if '/' in original_url:
-                img_id = original_url.split('/')[-1]
-            else:
-                img_id = original_url
-            
-            # 尝试不同的方式匹配图片ID
-            path_or_url = None
-            is_s3 = False
-            
-            # 1. 直接尝试原始ID
-            if img_id in image_map:
-                img_info = image_map[img_id]
-                if isinstance(img_info, dict):
-                    path_or_url = img_info["path"]
-                    is_s3 = img_info.get("is_s3", False)
-                else:
-                    path_or_url = img_info
-            # 2. 尝试添加常见图片扩展名
-            elif not re.search(r'\.(jpg|jpeg|png|gif|webp)$', img_id, re.IGNORECASE):
-                for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']:
-                    if img_id + ext in image_map:
-                        img_info = image_map[img_id + ext]
-                        if isinstance(img_info, dict):
-                            path_or_url = img_info["path"]
-                            is_s3 = img_info.get("is_s3", False)
-                        else:
-                            path_or_url = img_info
-                        break
+            img_id = original_url.rpartition('/')[2]
             
-            if path_or_url:
-                # 如果是S3路径，直接使用URL
-                if is_s3:
-                    return f"![{alt_text}]({path_or_url})"
-                # 否则需要计算相对路径
-                else:
-                    rel_path = os.path.relpath(path_or_url, output_dir)
-                    # 确保路径分隔符是正斜杠（Markdown兼容）
-                    rel_path = rel_path.replace(os.sep, '/')
-                    return f"![{alt_text}]({rel_path})"
-            else:
+            img_entry = image_index.get(img_id)
+            if not img_entry:
                 return match.group(0)  # 保留原始链接
+            
+            img_path_or_url, description = img_entry
+            if enhance_images and description:
+                return f"![{alt_text}]({img_path_or_url})\n\n**AI图片分析**：{description}\n"
+            return f"![{alt_text}]({img_path_or_url})"
         
-        # 使用正则表达式替换所有图片链接（非增强模式下）
-        if not self.enhance_images:
-            markdown_content = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', replace_image_link, markdown_content)
-        
-        # 写入Markdown文件
+        # 逐页替换图片引用并写入文件，不在内存中拼接整篇文档；先写入临时文件，完成后再替换目标文件
+        tmp_file = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
+            with open(tmp_file, 'w', encoding='utf-8', buffering=_MD_WRITE_BUFFER_SIZE) as f, \
+                    tqdm(total=len(ocr_response.pages), desc="处理页面", unit="页") as pbar:
+                separator = ""
+                for page in ocr_response.pages:
+                    if hasattr(page, 'markdown'):
+                        # 单次扫描替换页面中的所有图片引用
+                        f.write(separator)
+                        f.write(_IMG_REF_RE.sub(replace_image_link, page.markdown))
+                        separator = "\n\n"
+                    pbar.update(1)
+            os.replace(tmp_file, output_file)
             logger.info(f"转换完成! Markdown文档已保存至 {output_file}")
             
             # 如果启用了S3存储，上传Markdown文件到S3
@@ -682,6 +1195,8 @@ class MarkMuse:
             return final_output_path
         except Exception as e:
             logger.error(f"保存Markdown文件时出错: {str(e)}")
+            if os.path.exists(tmp_file):
+                os.unlink(tmp_file)
             return ""
     
     def convert_pdf_to_md(self, pdf_path_or_url: str, output_dir: str, output_filename: str = None, is_url: bool = False) -> str:
@@ -732,52 +1247,220 @@ class MarkMuse:
             logger.error(f"转换过程中发生错误: {str(e)}")
             return ""
 
-    def batch_convert(self, input_folder: str, output_folder: str) -> None:
+    def batch_convert(
+        self,
+        input_folder: str,
+        output_folder: str,
+        parallel_files: Optional[int] = None,
+        use_processes: bool = False
+    ) -> None:
         """
         批量转换文件夹中的所有PDF文件为Markdown
         
         参数:
         - input_folder: 输入文件夹
         - output_folder: 输出文件夹
+        - parallel_files: 同时转换的文件数，为 None 时使用配置中的 PARALLEL_FILES
+        - use_processes: 是否使用多进程转换；子进程各自创建客户端，OCR 速率上限在进程间平分
         """
         try:
             # 确保输出文件夹存在
             os.makedirs(output_folder, exist_ok=True)
             
             # 获取所有PDF文件
-            pdf_files = [f for f in os.listdir(input_folder) if f.lower().endswith('.pdf')]
+            pdf_files = list(_iter_pdf_files(input_folder))
             
             if not pdf_files:
                 logger.warning(f"在 {input_folder} 中没有找到PDF文件")
                 return
             
             logger.info(f"找到 {len(pdf_files)} 个PDF文件待转换")
+            total_files = len(pdf_files)
+            
+            # 内容相同的PDF只转换一次，其余文件复制本地的转换结果；上传到S3时各文件的对象路径不同，仍分别转换
+            duplicates = {}
+            if not self.use_s3:
+                pdf_files, duplicates = self._group_duplicate_pdfs(input_folder, pdf_files)
             
             success_count = 0
             failed_files = []
             
-            # 使用tqdm创建进度条
-            for pdf_file in tqdm(pdf_files, desc="批量转换", unit="文件"):
-                pdf_path = os.path.join(input_folder, pdf_file)
-                
-                logger.info(f"开始转换 {pdf_file}...")
-                output_path = self.convert_pdf_to_md(pdf_path, output_folder)
-                if output_path:  # 如果返回了有效路径或URL，则转换成功
-                    success_count += 1
-                    logger.info(f"PDF '{pdf_file}' 已成功转换，输出: {output_path}")
-                else:
-                    failed_files.append(pdf_file)
+            max_workers = max(1, min(len(pdf_files), parallel_files or config.parallel_files))
+            
+            if use_processes:
+                # 编码、解析和改写等 CPU 工作分布到多个进程，不受 GIL 限制
+                executor = self._create_process_pool(max_workers)
+                convert = _convert_in_worker
+            else:
+                # 转换过程以等待 OCR 和 LLM 接口为主，使用线程并行处理多个文件，
+                # OCR 请求由共享的限速器控制速率
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+                convert = self._convert_batch_file
+            # 多进程模式下子进程的缓存统计不可见
+            show_cache_stats = self.ocr_cache and not use_processes
+            
+            with tqdm(total=total_files, desc="批量转换", unit="文件") as pbar, executor:
+                futures = {
+                    executor.submit(convert, input_folder, pdf_file, output_folder): pdf_file
+                    for pdf_file in pdf_files
+                }
                 
-                # 添加一些延迟以避免API限制
-                time.sleep(1)
+                for future in concurrent.futures.as_completed(futures):
+                    pdf_file = futures[future]
+                    try:
+                        output_path = future.result()
+                    except Exception as e:
+                        # 工作进程崩溃 (BrokenProcessPool) 或参数无法序列化时，只记为该文件失败
+                        logger.error(f"转换 {pdf_file} 时发生错误: {str(e)}")
+                        output_path = None
+                    if output_path:  # 如果返回了有效路径或URL，则转换成功
+                        success_count += 1
+                        logger.info(f"PDF '{pdf_file}' 已成功转换，输出: {output_path}")
+                    else:
+                        failed_files.append(pdf_file)
+                    
+                    for duplicate in duplicates.get(pdf_file, ()):
+                        if self._copy_batch_output(output_path, output_folder, duplicate):
+                            success_count += 1
+                        else:
+                            failed_files.append(duplicate)
+                    
+                    postfix = {"成功": success_count, "失败": len(failed_files)}
+                    if show_cache_stats:
+                        stats = self.ocr_cache.get_stats()
+                        postfix.update({"缓存命中": stats["hits"], "未命中": stats["misses"]})
+                    pbar.set_postfix(postfix)
+                    pbar.update(1 + len(duplicates.get(pdf_file, ())))
             
             # 汇总报告
-            logger.info(f"批量转换完成！成功: {success_count}/{len(pdf_files)} 个文件")
+            logger.info(f"批量转换完成！成功: {success_count}/{total_files} 个文件")
             if failed_files:
                 logger.warning(f"转换失败的文件: {', '.join(failed_files)}")
+            if show_cache_stats:
+                stats = self.ocr_cache.get_stats()
+                logger.info(f"OCR缓存命中: {stats['hits']}，未命中: {stats['misses']}")
                 
         except Exception as e:
             logger.error(f"批量转换过程中发生错误: {str(e)}")
+    
+    @staticmethod
+    def _group_duplicate_pdfs(input_folder: str, pdf_files: list) -> Tuple[list, Dict[str, list]]:
+        """
+        按文件内容哈希找出重复的PDF
+        
+        参数:
+        - input_folder: 输入文件夹
+        - pdf_files: PDF文件名列表
+        
+        返回:
+        - Tuple[list, Dict[str, list]]: (需要转换的文件列表, 转换文件名到内容相同的其他文件名列表的映射)
+        """
+        first_by_hash = {}
+        unique_files = []
+        duplicates = {}
+        for pdf_file in pdf_files:
+            try:
+                content_hash = OCRCache.hash_file(os.path.join(input_folder, pdf_file))
+            except OSError as e:
+                # 无法读取的文件照常提交转换，由转换流程报告错误
+                logger.warning(f"计算文件哈希失败: {str(e)}, 文件: {pdf_file}")
+                unique_files.append(pdf_file)
+                continue
+            
+            first = first_by_hash.setdefault(content_hash, pdf_file)
+            if first == pdf_file:
+                unique_files.append(pdf_file)
+            else:
+                duplicates.setdefault(first, []).append(pdf_file)
+                logger.info(f"PDF '{pdf_file}' 与 '{first}' 内容相同，将复用其转换结果")
+        return unique_files, duplicates
+    
+    @staticmethod
+    def _copy_batch_output(output_path: Optional[str], output_folder: str, pdf_file: str) -> bool:
+        """
+        将已转换的Markdown复制为内容相同的PDF的输出
+        
+        图片链接相对于输出文件夹，复制后的文档继续引用原文档的图片目录
+        
+        参数:
+        - output_path: 原文档的转换结果
+        - output_folder: 输出文件夹
+        - pdf_file: 内容相同的PDF文件名
+        
+        返回:
+        - bool: 复制成功返回 True
+        """
+        if not output_path or not os.path.isfile(output_path):
+            return False
+        target = os.path.join(output_folder, f"{os.path.splitext(pdf_file)[0]}.md")
+        try:
+            shutil.copyfile(output_path, target)
+        except OSError as e:
+            logger.error(f"复制转换结果失败: {str(e)}, 文件: {pdf_file}")
+            return False
+        logger.info(f"PDF '{pdf_file}' 已复用相同内容的转换结果，输出: {target}")
+        return True
+    
+    def _create_process_pool(self, max_workers: int) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        创建批量转换用的进程池，每个子进程初始化时创建一个转换器
+        
+        参数:
+        - max_workers: 进程数
+        
+        返回:
+        - concurrent.futures.ProcessPoolExecutor: 进程池
+        """
+        options = dict(self._worker_options)
+        # 各进程的限速器互相独立，按进程数平分速率上限；未启用限速时子进程也不限速
+        options["ocr_rate_limit"] = max(1, self.ocr_rate_limit // max_workers) if self.ocr_rate_limit > 0 else 0
+        if self._worker_dropped:
+            logger.warning(
+                f"以下注入的对象无法传递给工作进程，子进程将根据配置重新创建: {', '.join(self._worker_dropped)}"
+            )
+        prompt_spec = (str(self.prompt_manager.base_dir), self.prompt_manager.default_type)
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_batch_worker,
+            initargs=(options, prompt_spec)
+        )
+    
+    def _convert_batch_file(self, input_folder: str, pdf_file: str, output_folder: str) -> Optional[str]:
+        """转换批量任务中的单个文件，出错时返回 None"""
+        logger.info(f"开始转换 {pdf_file}...")
+        try:
+            return self.convert_pdf_to_md(os.path.join(input_folder, pdf_file), output_folder)
+        except Exception as e:
+            logger.error(f"转换 {pdf_file} 时发生错误: {str(e)}")
+            return None
+
+# 多进程批量转换时，工作进程持有的转换器实例
+_WORKER_CONVERTER: Optional[MarkMuse] = None
+
+
+def _init_batch_worker(options: Dict[str, Any], prompt_spec: Tuple[str, str]) -> None:
+    """
+    进程池工作进程初始化，在子进程中重新创建客户端和转换器
+    
+    参数:
+    - options: MarkMuse 构造参数
+    - prompt_spec: (提示词模板目录, 模板类型)
+    """
+    global _WORKER_CONVERTER
+    # fork 出的子进程中没有日志监听线程，直接使用监听器的处理器输出
+    if _LOG_LISTENER is not None:
+        logging.getLogger().handlers = list(_LOG_LISTENER.handlers)
+    
+    from clients.prompts import PromptManager
+    
+    base_dir, default_type = prompt_spec
+    prompt_manager = PromptManager(base_dir=base_dir, default_type=default_type)
+    _WORKER_CONVERTER = MarkMuse(prompt_manager=prompt_manager, **options)
+
+
+def _convert_in_worker(input_folder: str, pdf_file: str, output_folder: str) -> Optional[str]:
+    """在工作进程中转换单个文件"""
+    return _WORKER_CONVERTER._convert_batch_file(input_folder, pdf_file, output_folder)
 
 
 def main():
@@ -807,11 +1490,15 @@ def main():
     
     # 图片理解增强选项
     parser.add_argument('--enhance-image', action='store_true', help="启用图片理解增强功能")
+    parser.add_argument('--skip-captioned-images', action='store_true', default=None,
+                        help="已有图注的图片跳过图片理解分析")
     parser.add_argument('--llm-provider', choices=['openai', 'qianfan'], default='openai', 
                        help="LLM 服务提供商 (openai 或 qianfan)")
     
     # 并行处理选项
     parser.add_argument('--parallel-images', type=int, help="并行处理图片的数量")
+    parser.add_argument('--parallel-files', type=int, help="批量模式下并行处理文件的数量")
+    parser.add_argument('--batch-processes', action='store_true', help="批量模式下使用多进程并行转换文件")
     
     # 提示词模板选项
     parser.add_argument('--templates-dir', help="提示词模板目录路径")
@@ -824,6 +1511,9 @@ def main():
     
     args = parser.parse_args()
     
+    # 命令行模式下通过队列异步输出日志
+    _install_queue_logging()
+    
     # 设置日志级别
     if args.debug:
         logger.setLevel(logging.DEBUG)
@@ -856,14 +1546,23 @@ def main():
     else:
         s3_config = None
     
-    # 创建客户端
-    clients = create_clients(config, args.llm_provider)
-    ocr_client = clients["ocr_client"]
-    llm_client = clients["llm_client"]
-    
-    if not ocr_client:
-        logger.error("无法创建 OCR 客户端，请检查 API 密钥配置")
-        sys.exit(1)
+    # 多进程批量转换时客户端由各工作进程创建，主进程只检查配置
+    batch_processes = bool(args.batch and args.batch_processes)
+    if batch_processes:
+        ocr_client = llm_client = None
+        if not config.mistral_api_key:
+            logger.error("未设置 Mistral API 密钥，无法创建 OCR 客户端，请检查 API 密钥配置")
+            sys.exit(1)
+    else:
+        # 创建客户端，未启用图片增强时不创建 LLM 客户端
+        from clients.factory import create_ocr_client, create_llm_client
+        
+        ocr_client = create_ocr_client(config)
+        llm_client = create_llm_client(config, args.llm_provider) if args.enhance_image else None
+        
+        if not ocr_client:
+            logger.error("无法创建 OCR 客户端，请检查 API 密钥配置")
+            sys.exit(1)
     
     # 如果启用图片增强但未设置对应API密钥，显示警告
     if args.enhance_image:
@@ -895,6 +1594,7 @@ def main():
                 os.makedirs(templates_dir, exist_ok=True)
             
             logger.info(f"使用提示词模板目录: {templates_dir}, 模板类型: {args.template_type}")
+            from clients.prompts import PromptManager
             prompt_manager = PromptManager(base_dir=templates_dir, default_type=args.template_type)
         except Exception as e:
             logger.error(f"创建提示词管理器失败: {str(e)}，将使用默认提示词")
@@ -905,6 +1605,7 @@ def main():
             if not args.input_folder or not args.output_folder:
                 parser.error("批量模式需要提供 --input-folder 和 --output-folder 参数")
             
+            # 多进程模式下主进程不创建客户端，工作进程根据配置各自创建
             converter = MarkMuse(
                 ocr_client=ocr_client,
                 llm_client=llm_client,
@@ -913,9 +1614,13 @@ def main():
                 use_s3=use_s3,
                 s3_config=s3_config if isinstance(s3_config, dict) else None,
                 parallel_images=args.parallel_images,
-                prompt_manager=prompt_manager
+                prompt_manager=prompt_manager,
+                skip_captioned_images=args.skip_captioned_images,
+                create_clients=not batch_processes
+            )
+            converter.batch_convert(
+                args.input_folder, args.output_folder, args.parallel_files, use_processes=args.batch_processes
             )
-            converter.batch_convert(args.input_folder, args.output_folder)
         
         # 处理单文件转换（本地文件）
         elif args.file:
@@ -929,7 +1634,8 @@ def main():
                 use_s3=use_s3,
                 s3_config=s3_config if isinstance(s3_config, dict) else None,
                 parallel_images=args.parallel_images,
-                prompt_manager=prompt_manager
+                prompt_manager=prompt_manager,
+                skip_captioned_images=args.skip_captioned_images
             )
             output_path = converter.convert_pdf_to_md(args.file, output_dir, args.output_name)
             if not output_path:
@@ -950,7 +1656,8 @@ def main():
                 use_s3=use_s3,
                 s3_config=s3_config if isinstance(s3_config, dict) else None,
                 parallel_images=args.parallel_images,
-                prompt_manager=prompt_manager
+                prompt_manager=prompt_manager,
+                skip_captioned_images=args.skip_captioned_images
             )
             output_path = converter.convert_pdf_to_md(args.url, output_dir, args.output_name, is_url=True)
             if not output_path:
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图片分析缓存测试: 用于测试精确层和语义层的命中规则
+"""
+
+import os
+import sys
+import logging
+import tempfile
+import unittest
+from unittest import mock
+
+# 确保可以导入项目模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 配置日志
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# 尝试导入图片分析缓存模块
+try:
+    from clients.llm import ImageAnalysisCache
+    from clients.llm import cache as cache_module
+except ImportError:
+    logger.error("未能导入LLM模块，请确保项目结构正确")
+    sys.exit(1)
+
+MODEL = "gpt-4o"
+
+# 测试图片及其感知哈希: 近似图片与原图只差 1 位，无关图片差 64 位
+IMAGE = b"image-original"
+SIMILAR_IMAGE = b"image-similar"
+OTHER_IMAGE = b"image-other"
+FAKE_HASHES = {
+    IMAGE: 0x0F0F0F0F0F0F0F0F,
+    SIMILAR_IMAGE: 0x0F0F0F0F0F0F0F0E,
+    OTHER_IMAGE: 0xF0F0F0F0F0F0F0F0,
+}
+
+
+class ImageAnalysisCacheTest(unittest.TestCase):
+    """测试图片分析缓存功能"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+        
+        # 使用固定的感知哈希，测试不依赖 Pillow
+        patchers = [
+            mock.patch.object(cache_module, "dhash", FAKE_HASHES.get),
+            mock.patch.object(cache_module, "PIL_SUPPORT", True),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        self.cache = ImageAnalysisCache(self.cache_dir, max_distance=4)
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        self.temp_dir.cleanup()
+    
+    def _store(self, image_data, prompt, description):
+        """分析未命中后写入结果"""
+        cached, hashes = self.cache.lookup(image_data, MODEL, prompt)
+        self.assertIsNone(cached, "写入前应未命中")
+        self.assertTrue(self.cache.store(hashes, MODEL, description), "写入缓存应返回True")
+    
+    def test_exact_hit(self):
+        """测试相同图片和提示词命中精确层"""
+        self._store(IMAGE, "描述图片", "一张图表")
+        
+        cached, _ = self.cache.lookup(IMAGE, MODEL, "描述图片")
+        self.assertEqual(cached, "一张图表", "相同图片和提示词应命中")
+        self.assertEqual(self.cache.get_stats(), {"hits": 1, "semantic_hits": 0, "misses": 1}, "命中统计应正确")
+        
+        logger.info("图片分析缓存精确层测试通过")
+    
+    def test_semantic_hit(self):
+        """测试近似图片在相同提示词下命中语义层"""
+        self._store(IMAGE, "描述图片", "一张图表")
+        
+        cached, _ = self.cache.lookup(SIMILAR_IMAGE, MODEL, "描述图片")
+        self.assertEqual(cached, "一张图表", "近似图片应命中语义层")
+        cached, _ = self.cache.lookup(OTHER_IMAGE, MODEL, "描述图片")
+        self.assertIsNone(cached, "汉明距离过大的图片应未命中")
+        self.assertEqual(self.cache.get_stats()["semantic_hits"], 1, "语义层命中统计应正确")
+        
+        logger.info("图片分析缓存语义层测试通过")
+    
+    def test_semantic_requires_same_prompt(self):
+        """测试语义层不复用其他提示词或模型的分析结果"""
+        self._store(IMAGE, "结合第1页内容描述图片", "第1页的图表")
+        
+        cached, _ = self.cache.lookup(SIMILAR_IMAGE, MODEL, "结合第2页内容描述图片")
+        self.assertIsNone(cached, "不同提示词下的近似图片应未命中")
+        cached, _ = self.cache.lookup(SIMILAR_IMAGE, "other-model", "结合第1页内容描述图片")
+        self.assertIsNone(cached, "不同模型下的近似图片应未命中")
+        
+        logger.info("图片分析缓存提示词隔离测试通过")
+    
+    def test_index_reload(self):
+        """测试重新加载的语义索引保留提示词信息"""
+        self._store(IMAGE, "描述图片", "一张图表")
+        
+        reloaded = ImageAnalysisCache(self.cache_dir, max_distance=4)
+        cached, _ = reloaded.lookup(SIMILAR_IMAGE, MODEL, "描述图片")
+        self.assertEqual(cached, "一张图表", "重新加载后近似图片应命中语义层")
+        cached, _ = reloaded.lookup(SIMILAR_IMAGE, MODEL, "其他提示词")
+        self.assertIsNone(cached, "重新加载后不同提示词应未命中")
+
+
+if __name__ == '__main__':
+    unittest.main()
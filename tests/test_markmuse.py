@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MarkMuse转换器测试: 用于测试Markdown生成和图片处理辅助函数
+"""
+
+import os
+import sys
+import base64
+import struct
+import logging
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# 确保可以导入项目模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 配置日志
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# 尝试导入MarkMuse模块
+try:
+    import markmuse
+    from markmuse import MarkMuse, _probe_image, _MIN_ANALYSIS_PIXELS
+    from clients.prompts import PromptManager
+except ImportError:
+    logger.error("未能导入MarkMuse模块，请确保项目结构正确")
+    sys.exit(1)
+
+
+class FakeStorage:
+    """模拟S3存储，记录上传的文件"""
+    
+    def __init__(self):
+        self.uploaded = []
+    
+    def upload_file(self, local_path, remote_path, content_type=None):
+        self.uploaded.append(remote_path)
+        return f"https://s3.example.com/{remote_path}"
+    
+    def upload_bytes(self, data, remote_path, content_type=None):
+        self.uploaded.append(remote_path)
+        return f"https://s3.example.com/{remote_path}"
+
+
+def create_converter(use_s3: bool = False) -> MarkMuse:
+    """创建不连接OCR和LLM服务的转换器实例"""
+    converter = MarkMuse.__new__(MarkMuse)
+    converter.enhance_images = False
+    converter.skip_captioned_images = False
+    converter.use_s3 = use_s3
+    converter.storage_client = FakeStorage() if use_s3 else None
+    return converter
+
+
+class CreateMarkdownTest(unittest.TestCase):
+    """测试从OCR结果生成Markdown文件"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ocr_response = SimpleNamespace(pages=[
+            SimpleNamespace(markdown="# 第一页", images=[]),
+            SimpleNamespace(markdown="第二页", images=[])
+        ])
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        self.temp_dir.cleanup()
+    
+    def test_nested_output_filename_with_s3(self):
+        """测试使用S3时输出文件名包含子目录"""
+        converter = create_converter(use_s3=True)
+        
+        result = converter.create_markdown_from_ocr(self.ocr_response, self.temp_dir.name, "processed/task/doc")
+        
+        self.assertEqual(result, "https://s3.example.com/processed/task/doc/processed/task/doc.md", "应返回S3 URL")
+        local_file = os.path.join(self.temp_dir.name, "processed", "task", "doc.md")
+        with open(local_file, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# 第一页\n\n第二页", "Markdown内容应按页拼接")
+        self.assertFalse(
+            os.path.exists(os.path.join(self.temp_dir.name, "processed", "task", "doc_images")),
+            "使用S3时不应创建本地图片目录"
+        )
+        
+        logger.info("嵌套输出文件名测试通过")
+    
+    def test_nested_output_filename_local(self):
+        """测试本地存储时输出文件名包含子目录"""
+        converter = create_converter()
+        
+        result = converter.create_markdown_from_ocr(self.ocr_response, self.temp_dir.name, "a/b/doc")
+        
+        self.assertEqual(result, os.path.join(self.temp_dir.name, "a/b/doc.md"), "应返回本地文件路径")
+        self.assertTrue(os.path.isfile(result), "Markdown文件应已生成")
+
+
+
+class ShortReadFile:
+    """每次 readinto 最多读取少量字节的文件，模拟管道或网络文件系统的短读"""
+    
+    def __init__(self, path, max_read):
+        self.file = open(path, "rb")
+        self.max_read = max_read
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.file.close()
+    
+    def fileno(self):
+        return self.file.fileno()
+    
+    def readinto(self, buffer):
+        return self.file.readinto(memoryview(buffer)[:self.max_read])
+
+
+class EncodePdfTest(unittest.TestCase):
+    """测试PDF分块base64编码"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.temp_dir.name, "doc.pdf")
+        self.data = bytes(range(256)) * 4 + b"%%EOF"
+        with open(self.pdf_path, "wb") as f:
+            f.write(self.data)
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        self.temp_dir.cleanup()
+    
+    def test_short_reads(self):
+        """测试读取不满一块时补读，编码结果与整体编码一致"""
+        converter = create_converter()
+        expected = "data:application/pdf;base64," + base64.b64encode(self.data).decode("ascii")
+        
+        with mock.patch.object(markmuse, "_B64_CHUNK_SIZE", 30), \
+                mock.patch.object(markmuse, "open", lambda path, mode: ShortReadFile(path, 7), create=True):
+            result = converter.encode_pdf(self.pdf_path, prefix="data:application/pdf;base64,")
+        
+        self.assertEqual(result, expected, "短读时编码结果应正确")
+        
+        logger.info("PDF分块编码测试通过")
+
+
+def make_png(width: int, height: int) -> bytes:
+    """构造只包含 IHDR 的PNG文件头"""
+    return b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """构造包含 APP0 段和 SOF0 帧头的JPEG文件头"""
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>HBHH', 17, 8, height, width) + b'\x00' * 10
+    return b'\xff\xd8' + app0 + sof0
+
+
+def make_webp(chunk: bytes, payload: bytes) -> bytes:
+    """构造指定块类型的WebP文件头"""
+    return b'RIFF' + struct.pack('<I', 4 + 8 + len(payload)) + b'WEBP' + chunk + struct.pack('<I', len(payload)) + payload
+
+
+class ProbeImageTest(unittest.TestCase):
+    """测试根据文件头识别图片格式和尺寸"""
+    
+    def test_png(self):
+        """测试PNG尺寸"""
+        self.assertEqual(_probe_image(make_png(640, 480)), ('png', 640, 480))
+    
+    def test_gif(self):
+        """测试GIF尺寸"""
+        for signature in (b'GIF87a', b'GIF89a'):
+            self.assertEqual(_probe_image(signature + struct.pack('<HH', 120, 90) + b'\x00' * 3), ('gif', 120, 90))
+    
+    def test_jpeg(self):
+        """测试JPEG跳过APP段后读取帧头尺寸"""
+        self.assertEqual(_probe_image(make_jpeg(800, 600)), ('jpeg', 800, 600))
+    
+    def test_webp(self):
+        """测试三种WebP编码的尺寸"""
+        vp8 = make_webp(b'VP8 ', b'\x00\x00\x00' + b'\x9d\x01\x2a' + struct.pack('<HH', 300, 200))
+        self.assertEqual(_probe_image(vp8), ('webp', 300, 200))
+        
+        bits = (300 - 1) | ((200 - 1) << 14)
+        vp8l = make_webp(b'VP8L', b'\x2f' + bits.to_bytes(4, 'little'))
+        self.assertEqual(_probe_image(vp8l), ('webp', 300, 200))
+        
+        vp8x = make_webp(b'VP8X', b'\x00' * 4 + (300 - 1).to_bytes(3, 'little') + (200 - 1).to_bytes(3, 'little'))
+        self.assertEqual(_probe_image(vp8x), ('webp', 300, 200))
+        
+        self.assertEqual(_probe_image(make_webp(b'ALPH', b'\x00' * 10)), ('webp', None, None), "未知块类型应无法读取尺寸")
+    
+    def test_unknown_format(self):
+        """测试无法识别的格式"""
+        self.assertIsNone(_probe_image(b'BM' + b'\x00' * 30), "BMP不在识别范围内")
+        self.assertIsNone(_probe_image(b''), "空数据应返回None")
+    
+    def test_truncated(self):
+        """测试截断的文件头"""
+        self.assertIsNone(_probe_image(make_png(640, 480)[:20]), "尺寸字段被截断的PNG应返回None")
+        self.assertIsNone(_probe_image(b'GIF89a\x10'), "尺寸字段被截断的GIF应返回None")
+        self.assertIsNone(_probe_image(make_jpeg(800, 600)[:26]), "帧头被截断的JPEG应返回None")
+        self.assertEqual(_probe_image(make_jpeg(800, 600)[:20]), ('jpeg', None, None), "未读到帧头的JPEG应无法读取尺寸")
+    
+    def test_min_pixels_gate(self):
+        """测试尺寸过小或格式无法识别的图片不送入分析"""
+        self.assertEqual(_MIN_ANALYSIS_PIXELS, 100 * 100)
+        self.assertTrue(MarkMuse._should_analyze_image("big.png", make_png(100, 100)), "达到阈值的图片应分析")
+        self.assertFalse(MarkMuse._should_analyze_image("small.png", make_png(99, 100)), "小于阈值的图片不应分析")
+        self.assertTrue(MarkMuse._should_analyze_image("photo.jpeg", make_jpeg(800, 600)[:20]), "尺寸未知的图片应分析")
+        self.assertFalse(MarkMuse._should_analyze_image("image.bmp", b'BM' + b'\x00' * 30), "无法识别的格式不应分析")
+
+
+class ImageIndexTest(unittest.TestCase):
+    """测试Markdown图片引用索引"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.output_dir = os.path.join(tempfile.gettempdir(), "markmuse_out")
+        self.images_dir = os.path.join(self.output_dir, "doc_images")
+    
+    def test_relative_paths(self):
+        """测试本地图片转换为相对于输出目录的路径，S3图片保留URL"""
+        image_map = {
+            "img-0.jpeg": {"path": os.path.join(self.images_dir, "img-0.jpeg"), "description": "图表"},
+            "img-1.jpeg": os.path.join(self.output_dir, "img-1.jpeg"),
+            "img-2.jpeg": os.path.join(os.path.dirname(self.output_dir), "shared", "img-2.jpeg"),
+            "img-3.jpeg": {"path": "https://s3.example.com/doc/img-3.jpeg", "is_s3": True},
+            "img-4.jpeg": {"path": None},
+        }
+        index = MarkMuse._build_image_index(image_map, self.output_dir)
+        
+        self.assertEqual(index["img-0.jpeg"], ("doc_images/img-0.jpeg", "图表"))
+        self.assertEqual(index["img-1.jpeg"], ("img-1.jpeg", None), "输出目录内的图片应只保留文件名")
+        self.assertEqual(index["img-2.jpeg"], ("../shared/img-2.jpeg", None))
+        self.assertEqual(index["img-3.jpeg"], ("https://s3.example.com/doc/img-3.jpeg", None))
+        self.assertNotIn("img-4.jpeg", index, "没有路径的图片不应加入索引")
+    
+    def test_stem_priority(self):
+        """测试不带扩展名的引用按扩展名优先级匹配"""
+        image_map = {
+            "img-0.jpeg": os.path.join(self.images_dir, "img-0.jpeg"),
+            "img-0.png": os.path.join(self.images_dir, "img-0.png"),
+            "img-0.gif": os.path.join(self.images_dir, "img-0.gif"),
+            "img-1.webp": os.path.join(self.images_dir, "img-1.webp"),
+            "img-1.bmp": os.path.join(self.images_dir, "img-1.bmp"),
+            "img-2": os.path.join(self.images_dir, "img-2"),
+            "img-2.png": os.path.join(self.images_dir, "img-2.png"),
+        }
+        index = MarkMuse._build_image_index(image_map, self.output_dir)
+        
+        self.assertEqual(index["img-0"][0], "doc_images/img-0.png", "应优先匹配PNG")
+        self.assertEqual(index["img-1"][0], "doc_images/img-1.webp", "不在优先级表中的扩展名不参与匹配")
+        self.assertEqual(index["img-2"][0], "doc_images/img-2", "完全匹配的图片ID优先于扩展名匹配")
+
+
+class CaptionedImagesTest(unittest.TestCase):
+    """测试查找已有图注的图片"""
+    
+    def test_find_captioned_images(self):
+        """测试图注和详细替代文本的识别"""
+        pages = [
+            SimpleNamespace(markdown=(
+                "![img-0.jpeg](img-0.jpeg)\n\nFigure 1: Quarterly revenue\n\n"
+                "![img-1.jpeg](img-1.jpeg)\n\n正文段落\n\n"
+                "![img-2.jpeg](img-2.jpeg)\n*Fig. 2* 系统架构"
+            )),
+            SimpleNamespace(markdown=(
+                "![A detailed chart of the quarterly revenue](images/img-3.jpeg)\n\n"
+                "![short alt](img-4.jpeg) 图 4 结构示意\n\n"
+                "![img-5.jpeg](img-5.jpeg)"
+            )),
+            SimpleNamespace(markdown=None),
+            SimpleNamespace(),
+        ]
+        
+        self.assertEqual(
+            MarkMuse._find_captioned_images(pages),
+            {"img-0.jpeg", "img-2.jpeg", "img-3.jpeg", "img-4.jpeg"}
+        )
+        
+        logger.info("图注识别测试通过")
+
+
+def get_worker_rate_limit() -> int:
+    """在工作进程中返回转换器实际使用的OCR速率上限"""
+    return markmuse._WORKER_CONVERTER.ocr_rate_limit
+
+
+class ProcessPoolTest(unittest.TestCase):
+    """测试多进程批量转换的工作进程初始化"""
+    
+    def _create_pool(self, ocr_rate_limit, dropped=()):
+        """创建不创建OCR和LLM客户端的进程池"""
+        converter = create_converter()
+        converter.ocr_rate_limit = ocr_rate_limit
+        converter._worker_options = {"enhance_images": False, "create_clients": False}
+        converter._worker_dropped = list(dropped)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        converter.prompt_manager = PromptManager(base_dir=temp_dir.name)
+        executor = converter._create_process_pool(4)
+        self.addCleanup(executor.shutdown)
+        return executor
+    
+    def test_rate_limit_split(self):
+        """测试按实例的速率上限在进程间平分"""
+        for ocr_rate_limit, expected, message in (
+            (120, 30, "速率上限应按进程数平分"),
+            (2, 1, "平分后至少为1"),
+            (0, 0, "未启用限速时子进程也不限速"),
+        ):
+            executor = self._create_pool(ocr_rate_limit)
+            self.assertEqual(executor.submit(get_worker_rate_limit).result(timeout=60), expected, message)
+    
+    def test_dropped_objects_logged(self):
+        """测试无法传给工作进程的注入对象会记录警告"""
+        with self.assertLogs('markmuse', level='WARNING') as logs:
+            self._create_pool(60, dropped=["ocr_client", "image_cache"])
+        self.assertIn("ocr_client, image_cache", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+OCR缓存测试: 用于测试OCR结果磁盘缓存的读写、过期和统计
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import unittest
+
+# 确保可以导入项目模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 配置日志
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# 尝试导入OCR缓存模块
+try:
+    from clients.ocr import OCRCache
+except ImportError:
+    logger.error("未能导入OCR模块，请确保项目结构正确")
+    sys.exit(1)
+
+
+class FakeOCRResponse:
+    """模拟支持 model_dump_json 的OCR响应"""
+    
+    def __init__(self, data):
+        self.data = data
+    
+    def model_dump_json(self):
+        return json.dumps(self.data)
+
+
+class OCRCacheTest(unittest.TestCase):
+    """测试OCR缓存功能"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = OCRCache(os.path.join(self.temp_dir.name, "cache"), ttl_days=1)
+        
+        # 创建测试PDF文件
+        self.pdf_path = os.path.join(self.temp_dir.name, "test.pdf")
+        with open(self.pdf_path, "wb") as f:
+            f.write(b"%PDF-1.4 test content")
+        
+        self.response_data = {
+            "model": "mistral-ocr-latest",
+            "pages": [{"index": 0, "markdown": "# 测试页面", "images": [], "dimensions": None}]
+        }
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        self.temp_dir.cleanup()
+    
+    def test_get_and_set(self):
+        """测试缓存写入和读取"""
+        key = OCRCache.make_key(OCRCache.hash_file(self.pdf_path), "mistral-ocr-latest", True)
+        
+        self.assertIsNone(self.cache.get(key), "未写入时应未命中")
+        self.assertTrue(self.cache.set(key, FakeOCRResponse(self.response_data)), "写入缓存应返回True")
+        
+        cached = self.cache.get(key)
+        self.assertIsNotNone(cached, "写入后应命中缓存")
+        self.assertEqual(cached.pages[0].markdown, "# 测试页面", "缓存内容应与写入一致")
+        self.assertEqual(self.cache.get_stats(), {"hits": 1, "misses": 1}, "命中统计应正确")
+        
+        logger.info("OCR缓存读写测试通过")
+    
+    def test_content_hash(self):
+        """测试缓存键随文件内容变化"""
+        first_hash = OCRCache.hash_file(self.pdf_path)
+        with open(self.pdf_path, "ab") as f:
+            f.write(b" changed")
+        self.assertNotEqual(OCRCache.hash_file(self.pdf_path), first_hash, "文件内容变化后哈希应不同")
+    
+    def test_expired_entry(self):
+        """测试过期条目被删除"""
+        key = OCRCache.make_key(OCRCache.hash_file(self.pdf_path), "mistral-ocr-latest", True)
+        self.cache.set(key, FakeOCRResponse(self.response_data))
+        
+        # 将缓存文件的修改时间调整到有效期之前
+        expired = time.time() - 2 * 86400
+        for name in os.listdir(self.cache.cache_dir):
+            os.utime(os.path.join(self.cache.cache_dir, name), (expired, expired))
+        
+        self.assertEqual(self.cache.evict_expired(), 1, "应删除1个过期条目")
+        self.assertIsNone(self.cache.get(key), "过期条目应未命中")
+        
+        logger.info("OCR缓存过期测试通过")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+OCR限速器测试: 用于测试令牌桶的限速、降速和恢复
+"""
+
+import os
+import sys
+import time
+import logging
+import unittest
+
+# 确保可以导入项目模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 配置日志
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# 尝试导入OCR限速器模块
+try:
+    from clients.ocr import AdaptiveRateLimiter
+except ImportError:
+    logger.error("未能导入OCR模块，请确保项目结构正确")
+    sys.exit(1)
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    """测试自适应限速器功能"""
+    
+    def test_burst_then_wait(self):
+        """测试令牌用尽后需要等待补充"""
+        limiter = AdaptiveRateLimiter(600)  # 每 0.1 秒补充一个令牌
+        for _ in range(600):
+            self.assertEqual(limiter.acquire(), 0.0, "桶内有令牌时不应等待")
+        
+        start = time.monotonic()
+        self.assertGreater(limiter.acquire(), 0.0, "令牌用尽后应等待")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05, "等待时间应接近补充间隔")
+        
+        logger.info("限速器令牌桶测试通过")
+    
+    def test_adaptive_rate(self):
+        """测试触发速率限制后降速并逐步恢复"""
+        limiter = AdaptiveRateLimiter(60)
+        
+        limiter.on_rate_limited()
+        self.assertAlmostEqual(limiter.rate, limiter.max_rate / 2, msg="触发速率限制后速率应减半")
+        
+        for _ in range(10):
+            limiter.on_success()
+        self.assertAlmostEqual(limiter.rate, limiter.max_rate, msg="多次成功后速率应恢复到上限")
+        
+        logger.info("限速器自适应测试通过")
+    
+    def test_invalid_rate(self):
+        """测试非法速率"""
+        with self.assertRaises(ValueError):
+            AdaptiveRateLimiter(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
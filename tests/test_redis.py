@@ -11,6 +11,9 @@ import logging
 import unittest
 import json
 import time
+import concurrent.futures
+from dataclasses import replace
+from urllib.parse import unquote, urlsplit
 from dotenv import load_dotenv
 
 # 确保可以导入项目模块
@@ -80,10 +83,9 @@ class RedisTest(unittest.TestCase):
         if hasattr(self, 'redis') and self.redis:
             # 清理测试数据
             try:
-                keys = self.redis.redis.keys(f"{self.test_prefix}*")
-                if keys:
-                    self.redis.redis.delete(*keys)
-                    logger.info(f"已清理 {len(keys)} 个测试键")
+                deleted = self.redis.clean_prefix(self.test_prefix)
+                if deleted:
+                    logger.info(f"已清理 {deleted} 个测试键")
             except Exception as e:
                 logger.warning(f"清理测试数据失败: {str(e)}")
             
@@ -279,6 +281,141 @@ class RedisTest(unittest.TestCase):
             logger.error(f"Redis序列化测试失败: {str(e)}")
             self.fail(f"Redis序列化测试失败: {str(e)}")
     
+    def test_batch_operations(self):
+        """测试批量操作（mset/mget/batch）"""
+        try:
+            mapping = {
+                f"{self.test_prefix}batch:1": "value1",
+                f"{self.test_prefix}batch:2": {"nested": [1, 2, 3]},
+                f"{self.test_prefix}batch:3": 3,
+            }
+            
+            self.assertTrue(self.redis.mset(mapping, ex=60), "mset操作应返回True")
+            
+            keys = list(mapping) + [f"{self.test_prefix}batch:missing"]
+            values = self.redis.mget(keys, default="default")
+            self.assertEqual(values, ["value1", {"nested": [1, 2, 3]}, "3", "default"], "mget应按顺序返回值")
+            
+            with self.redis.batch() as pipe:
+                pipe.set(f"{self.test_prefix}batch:4", "value4")
+                pipe.hset(f"{self.test_prefix}batch:hash", "field", "value")
+            self.assertEqual(self.redis.get(f"{self.test_prefix}batch:4"), "value4", "batch中的set应生效")
+            self.assertEqual(self.redis.hget(f"{self.test_prefix}batch:hash", "field"), "value", "batch中的hset应生效")
+            
+            self.assertEqual(self.redis.clean_prefix(f"{self.test_prefix}batch:"), 5, "clean_prefix应删除5个键")
+            
+            logger.info("Redis批量操作测试通过")
+        except Exception as e:
+            logger.error(f"Redis批量操作测试失败: {str(e)}")
+            self.fail(f"Redis批量操作测试失败: {str(e)}")
+    
+    def test_concurrent_threads(self):
+        """测试多个线程共享同一个客户端读写"""
+        def worker(i):
+            key = f"{self.test_prefix}thread:{i}"
+            self.redis.set(key, f"value{i}")
+            return self.redis.get(key)
+            
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            values = list(executor.map(worker, range(16)))
+        self.assertEqual(values, [f"value{i}" for i in range(16)], "各线程读写结果应正确")
+            
+        keys = [f"{self.test_prefix}thread:{i}" for i in range(16)]
+        self.assertEqual(self.redis.mget(keys[:2]), ["value0", "value1"], "mget应可正常使用")
+        self.assertEqual(self.redis.delete(*keys), 16, "delete应删除全部键")
+            
+        logger.info("Redis多线程测试通过")
+    
+    def test_msgpack_serialization(self):
+        """测试msgpack序列化方式"""
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            self.skipTest("未安装msgpack")
+        
+        client = RedisClient(url=self.redis.url, serializer="msgpack")
+        try:
+            test_key = f"{self.test_prefix}msgpack"
+            test_object = {"name": "测试对象", "values": [1, 2, 3], "nested": {"flag": True}}
+            
+            self.assertTrue(client.set(test_key, test_object), "set复杂对象应返回True")
+            self.assertEqual(client.get(test_key), test_object, "get操作应返回原始对象")
+            
+            # 普通字符串应保持为字符串
+            client.set(f"{test_key}:str", "测试值")
+            self.assertEqual(client.get(f"{test_key}:str"), "测试值", "字符串值应保持不变")
+            
+            # 兼容已经以JSON格式缓存的数据
+            self.redis.set(f"{test_key}:json", test_object)
+            self.assertEqual(client.get(f"{test_key}:json"), test_object, "应能读取JSON格式的旧数据")
+            
+            # 哈希表
+            client.hset(f"{test_key}:hash", "object", test_object)
+            self.assertEqual(client.hgetall(f"{test_key}:hash"), {"object": test_object}, "hgetall应返回原始对象")
+            
+            logger.info("Redis msgpack序列化测试通过")
+        finally:
+            client.close()
+    
+    def test_raw_bytes(self):
+        """测试原始字节写入与读取"""
+        test_key = f"{self.test_prefix}raw"
+        payload = bytes(range(256))
+
+        # 显式raw写入，原样读回
+        self.assertTrue(self.redis.set(test_key, payload, raw=True), "raw写入应返回True")
+        self.assertEqual(self.redis.get(test_key, raw=True), payload, "raw读取应返回原始字节")
+
+        # bytearray 自动按原始字节写入
+        self.redis.hset(f"{test_key}:hash", "blob", bytearray(payload))
+        self.assertEqual(self.redis.hget(f"{test_key}:hash", "blob", raw=True), payload, "hget应返回原始字节")
+
+        logger.info("Redis原始字节测试通过")
+    
+    def test_raw_tagged_prefix(self):
+        """测试以类型标记开头的原始字符串读回时保持不变"""
+        test_key = f"{self.test_prefix}raw_tag"
+        
+        # 以 j: 开头但不是JSON的值不应引发解析异常
+        self.redis.set(f"{test_key}:j", "j:hello", raw=True)
+        self.assertEqual(self.redis.get(f"{test_key}:j"), "j:hello", "无法解析的j:值应原样返回")
+        self.redis.hset(f"{test_key}:hash", "j", "j:hello", raw=True)
+        self.assertEqual(self.redis.hget(f"{test_key}:hash", "j"), "j:hello", "hget应原样返回无法解析的j:值")
+        self.assertEqual(self.redis.hgetall(f"{test_key}:hash"), {"j": "j:hello"}, "hgetall应原样返回无法解析的j:值")
+        self.assertEqual(self.redis.mget([f"{test_key}:j"]), ["j:hello"], "mget应原样返回无法解析的j:值")
+        
+        # 不是转义写入的 r: 值不应被去掉前缀
+        self.redis.set(f"{test_key}:r", "r:hello", raw=True)
+        self.assertEqual(self.redis.get(f"{test_key}:r"), "r:hello", "非转义的r:值应原样返回")
+        
+        # 客户端自身转义的值仍能还原
+        self.redis.set(f"{test_key}:escaped", "r:hello")
+        self.assertEqual(self.redis.get(f"{test_key}:escaped"), "r:hello", "转义写入的值应还原")
+        self.assertEqual(self.redis.get(f"{test_key}:escaped", raw=True), b"r:r:hello", "转义写入的值应带r:前缀")
+        
+        logger.info("Redis类型标记前缀测试通过")
+
+    def test_password_quoting(self):
+        """测试密码中的URL特殊字符经过编码后能被正确解析"""
+        if not USE_CONFIG:
+            self.skipTest("未找到配置模块")
+        password = "p@ss:w/rd#1"
+        config = replace(load_api_config(), redis_password=password, redis_url=None, redis_host="redis.example.com")
+        
+        client = RedisClient(config=config, unix_socket_path="/tmp/redis.sock")
+        parts = urlsplit(client.url)
+        self.assertEqual((parts.scheme, parts.path), ("unix", "/tmp/redis.sock"), "Unix套接字路径不应被密码截断")
+        self.assertEqual(unquote(parts.password), password, "Unix套接字URL中的密码应能还原")
+        client.close()
+        
+        client = RedisClient(config=replace(config, redis_unix_socket_path=None))
+        parts = urlsplit(client.url)
+        self.assertEqual(parts.hostname, "redis.example.com", "主机名不应被密码截断")
+        self.assertEqual(unquote(parts.password), password, "TCP URL中的密码应能还原")
+        client.close()
+        
+        logger.info("Redis密码编码测试通过")
+    
     def test_cache_methods(self):
         """测试缓存API（cache_set/cache_get/cache_delete/cache_clear）"""
         try:
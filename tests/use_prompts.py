@@ -140,6 +140,12 @@ def test_prompt_manager():
     # 创建提示词管理器
     manager = PromptManager(prompts_dir)
     
+    # 预编译目录下的所有模板
+    compiled = manager.precompile()
+    logger.info(f"预编译的Jinja2模板: {compiled}")
+    assert "ocr_analysis" in compiled
+    assert manager.get_template("ocr_analysis") is manager.get_template("ocr_analysis.j2")
+    
     # 从文件加载Jinja2模板
     try:
         ocr_template = manager.get_template("ocr_analysis", "jinja2")